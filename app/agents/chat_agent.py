@@ -1,22 +1,26 @@
 import os
 from fastapi import APIRouter, HTTPException
-from openai import OpenAI
-from typing import Dict
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
 import asyncio
+from app.llm.context import ChatContextManager, SUMMARY_PROMPT
+from app.llm.gateway import get_llm_gateway
+from app.utils.metrics import SESSIONS, stage
+from app.utils.session_store import get_session_store
+from app.utils.sse import sse_event, sse_response
 from app.utils.storage import save_conversation
 
 router = APIRouter()
 
-# Initialize client (OpenRouter or direct OpenAI)
-client = OpenAI(
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1"  # Remove this line for direct OpenAI
-)
+LLM_MODEL = "anthropic/claude-3-haiku"  # Or any other model
+CHAT_PARAMS = {"max_tokens": 300, "temperature": 0.7}
+CONTEXT_BUDGET_TOKENS = int(os.getenv("CHAT_CONTEXT_BUDGET_TOKENS", "2000"))
+CONTEXT_KEEP_MESSAGES = int(os.getenv("CHAT_CONTEXT_KEEP_MESSAGES", "6"))
+SESSION_TTL = 2 * 3600  # seconds of inactivity before a session expires
 
-# Session storage
-active_sessions: Dict[str, dict] = {}
+# Session storage (shared across workers when SESSION_STORE=sqlite)
+active_sessions = get_session_store("chat", SESSION_TTL)
+SESSIONS.set_function(lambda: len(active_sessions), agent="chat")
 
 SYSTEM_PROMPT = """You are StartupPal, a friendly AI assistant for our investment platform. 
 
@@ -27,46 +31,70 @@ Guidelines:
 - Never offer to schedule meetings or analyze documents"""
 
 
+async def summarize_turns(messages):
+    """Fold older turns into a short running summary"""
+    response = await get_llm_gateway().complete(
+        model=LLM_MODEL,
+        messages=[*messages, {"role": "user", "content": SUMMARY_PROMPT}],
+        max_tokens=250,
+        temperature=0.2
+    )
+    return response.choices[0].message.content
+
+
+context_manager = ChatContextManager(
+    active_sessions,
+    summarize_turns,
+    budget_tokens=CONTEXT_BUDGET_TOKENS,
+    keep_messages=CONTEXT_KEEP_MESSAGES
+)
+
+
 @router.post("/start")
 async def start_session():
     """Initialize new chat session"""
     session_id = str(uuid.uuid4())
-    active_sessions[session_id] = {
+    session = {
         "history": [
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "assistant", "content": "How can I help you today?"}
         ],
         "created_at": datetime.now()
     }
+    context_manager.init_session(session)
+    active_sessions.set(session_id, session)
     return {"session_id": session_id}
 
 
 @router.post("/message")
-async def handle_message(session_id: str, message: str):
-    """Handle general chat messages only"""
-    if session_id not in active_sessions:
+async def handle_message(session_id: str, message: str, stream: bool = False):
+    """Handle general chat messages only (streamed as SSE when ``stream`` is set)"""
+    session = active_sessions.get(session_id)
+    if session is None:
         raise HTTPException(404, "Session not found")
 
     # Add user message to history
-    active_sessions[session_id]["history"].append(
-        {"role": "user", "content": message}
-    )
+    context_manager.append(session, {"role": "user", "content": message})
+    active_sessions.set(session_id, session)
+
+    if stream:
+        return sse_response(stream_message(session_id, session))
 
     try:
         # Generate response
-        response = client.chat.completions.create(
-            model="anthropic/claude-3-haiku",  # Or any other model
-            messages=active_sessions[session_id]["history"],
-            max_tokens=300,
-            temperature=0.7
-        )
+        with stage("chat.context"):
+            messages = context_manager.build_messages(session)
+        with stage("chat.llm"):
+            response = await get_llm_gateway().complete(
+                model=LLM_MODEL,
+                messages=messages,
+                **CHAT_PARAMS
+            )
 
         ai_response = response.choices[0].message.content
 
-        # Update history
-        active_sessions[session_id]["history"].append(
-            {"role": "assistant", "content": ai_response}
-        )
+        # Update history, folding older turns in the background if over budget
+        record_reply(session_id, session, ai_response)
 
         return {"response": ai_response}
 
@@ -74,17 +102,36 @@ async def handle_message(session_id: str, message: str):
         raise HTTPException(500, f"Chat failed: {str(e)}")
 
 
-# Session cleanup (same as before)
+def record_reply(session_id: str, session: dict, ai_response: str):
+    # Re-read: a background summary may have rewritten the stored session meanwhile
+    session = active_sessions.get(session_id) or session
+    context_manager.append(session, {"role": "assistant", "content": ai_response})
+    active_sessions.set(session_id, session)
+    context_manager.maybe_summarize(session_id, session)
+
+
+async def stream_message(session_id: str, session: dict):
+    """Forward tokens as they arrive, then record the full reply in history"""
+    parts = []
+    try:
+        messages = context_manager.build_messages(session)
+        async for token in get_llm_gateway().stream(LLM_MODEL, messages, **CHAT_PARAMS):
+            parts.append(token)
+            yield sse_event({"content": token}, event="token")
+    except Exception as e:
+        yield sse_event({"detail": f"Chat failed: {str(e)}"}, event="error")
+        return
+
+    ai_response = "".join(parts)
+    record_reply(session_id, session, ai_response)
+    yield sse_event({"response": ai_response}, event="done")
+
+
+# Session cleanup via the store's expiry index
 async def clean_sessions():
     while True:
         await asyncio.sleep(3600)
-        stale_time = datetime.now() - timedelta(hours=2)
-        stale_sessions = [
-            sid for sid, data in active_sessions.items()
-            if data["created_at"] < stale_time
-        ]
-        for sid in stale_sessions:
-            del active_sessions[sid]
+        active_sessions.expire()
 
 
 @router.on_event("startup")
@@ -95,4 +142,4 @@ async def startup_tasks():
 @router.on_event("shutdown")
 async def save_conversations():
     for sid, data in active_sessions.items():
-        save_conversation(sid, data["history"])
\ No newline at end of file
+        save_conversation(sid, context_manager.build_messages(data))
\ No newline at end of file
@@ -1,12 +1,17 @@
 import os
+import asyncio
 import logging
 from typing import List, Dict
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from pydantic import BaseModel
 from typing import Optional
-from openai import OpenAI
 from dotenv import load_dotenv
-from app.utils.storage import save_email_draft
+from app.llm.coalesce import get_completion_coalescer
+from app.llm.gateway import get_llm_gateway
+from app.utils.sse import sse_event, sse_response
+from app.utils.email_store import get_email_store
+from app.utils.metrics import stage
+from app.utils.storage import save_email_draft, save_email_drafts
 from datetime import datetime
 
 load_dotenv()
@@ -14,14 +19,15 @@ load_dotenv()
 # Configuration
 LLM_MODEL = "anthropic/claude-3-haiku"  # Unified model
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+EMAIL_LLM_PARAMS = {"max_tokens": 500, "temperature": 0.7, "top_p": 0.9}
+EMAIL_BATCH_MAX = int(os.getenv("EMAIL_BATCH_MAX", "500"))
+EMAIL_BATCH_CONCURRENCY = int(os.getenv("EMAIL_BATCH_CONCURRENCY", "8"))
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-client = OpenAI(
-    api_key=OPENROUTER_API_KEY,
-    base_url="https://openrouter.ai/api/v1"
-)
+# Saves of streamed batches outlive a client disconnect; hold them until they finish
+_pending_saves = set()
 
 
 class EmailRequest(BaseModel):
@@ -31,12 +37,36 @@ class EmailRequest(BaseModel):
     details: Optional[str] = ""
 
 
-def build_email_prompt(request: EmailRequest) -> List[Dict]:
-    """Optimized prompt for Claude-3-Haiku email drafting"""
-    return [
-        {
-            "role": "system",
-            "content": f"""You are an expert email assistant. Draft a {request.tone} email with:
+class MergeRecipient(BaseModel):
+    recipient: str
+    variables: Dict[str, str] = {}
+
+
+class BatchEmailRequest(BaseModel):
+    """Shared template; ``{name}`` placeholders in subject and details are filled per recipient"""
+    subject: str
+    tone: Optional[str] = "professional"
+    details: Optional[str] = ""
+    recipients: List[MergeRecipient]
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def fill_template(template: str, variables: Dict[str, str]) -> str:
+    """Substitute ``{name}`` placeholders, leaving unknown ones as written"""
+    try:
+        return template.format_map(_KeepMissing(variables))
+    except (ValueError, IndexError, AttributeError):
+        return template
+
+
+def build_system_prompt(tone: str) -> Dict:
+    return {
+        "role": "system",
+        "content": f"""You are an expert email assistant. Draft a {tone} email with:
 
             Requirements:
             1. Strictly follow this structure:
@@ -44,9 +74,15 @@ def build_email_prompt(request: EmailRequest) -> List[Dict]:
                - Body: 2-3 concise paragraphs
                - Closing: "Best regards,"
                - Signature: "[Your Name]"
-            2. Tone: {request.tone}
+            2. Tone: {tone}
             3. Never use placeholders like [Your Name] - omit if unknown"""
-        },
+    }
+
+
+def build_email_prompt(request: EmailRequest, system_prompt: Optional[Dict] = None) -> List[Dict]:
+    """Optimized prompt for Claude-3-Haiku email drafting"""
+    return [
+        system_prompt or build_system_prompt(request.tone),
         {
             "role": "user",
             "content": f"""Recipient: {request.recipient}
@@ -56,37 +92,195 @@ def build_email_prompt(request: EmailRequest) -> List[Dict]:
     ]
 
 
+def validate_draft(draft: str) -> str:
+    draft = draft.strip()
+
+    # Post-processing validation
+    if not draft or len(draft.split()) < 20:
+        raise ValueError("Incomplete draft generated")
+    return draft
+
+
+async def finalize_draft(request: EmailRequest, draft: str) -> dict:
+    """Validate and persist a completed draft, writing in a worker thread off the event loop"""
+    draft = validate_draft(draft)
+
+    try:
+        with stage("email.save"):
+            await asyncio.to_thread(save_email_draft, request.recipient, request.subject, draft)
+    except Exception as e:
+        logger.warning(f"Draft not saved: {str(e)}")
+
+    return {
+        "draft": draft,
+        "model": LLM_MODEL,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+async def stream_draft(request: EmailRequest):
+    """Forward tokens as they arrive, then validate and save the full draft"""
+    parts = []
+    try:
+        async for token in get_llm_gateway().stream(LLM_MODEL, build_email_prompt(request), **EMAIL_LLM_PARAMS):
+            parts.append(token)
+            yield sse_event({"content": token}, event="token")
+        yield sse_event(await finalize_draft(request, "".join(parts)), event="done")
+    except Exception as e:
+        logger.error(f"Email generation failed: {str(e)}")
+        yield sse_event({"detail": f"Email drafting failed: {str(e)}"}, event="error")
+
+
 @router.post("/draft")
-async def draft_email(request: EmailRequest = Body(...)):
+async def draft_email(request: EmailRequest = Body(...), stream: bool = False):
     if not OPENROUTER_API_KEY:
         raise HTTPException(503, "API key missing")
 
+    if stream:
+        return sse_response(stream_draft(request))
+
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=build_email_prompt(request),
-            max_tokens=500,
-            temperature=0.7,
-            top_p=0.9
-        )
-
-        draft = response.choices[0].message.content.strip()
-
-        # Post-processing validation
-        if not draft or len(draft.split()) < 20:
-            raise ValueError("Incomplete draft generated")
-
-        try:
-            save_email_draft(request.recipient, request.subject, draft)
-        except Exception as e:
-            logger.warning(f"Draft not saved: {str(e)}")
-
-        return {
-            "draft": draft,
-            "model": LLM_MODEL,
-            "timestamp": datetime.now().isoformat()
-        }
+        with stage("email.llm"):
+            response = await get_completion_coalescer().complete(
+                model=LLM_MODEL,
+                messages=build_email_prompt(request),
+                **EMAIL_LLM_PARAMS
+            )
+
+        return await finalize_draft(request, response.choices[0].message.content)
 
     except Exception as e:
         logger.error(f"Email generation failed: {str(e)}")
-        raise HTTPException(500, f"Email drafting failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Email drafting failed: {str(e)}")
+
+
+async def draft_merged(request: EmailRequest, system_prompt: Dict, semaphore: asyncio.Semaphore) -> dict:
+    """One recipient of a mail merge; failures are reported, not raised"""
+    try:
+        async with semaphore:
+            with stage("email.llm"):
+                response = await get_completion_coalescer().complete(
+                    model=LLM_MODEL,
+                    messages=build_email_prompt(request, system_prompt),
+                    **EMAIL_LLM_PARAMS
+                )
+        return {"draft": validate_draft(response.choices[0].message.content), "status": "success"}
+    except Exception as e:
+        logger.error(f"Merged email for {request.recipient} failed: {str(e)}")
+        return {"draft": None, "status": "error", "error": f"Email drafting failed: {str(e)}"}
+
+
+def save_merged(requests: List[EmailRequest], results: Dict[int, dict]) -> int:
+    """Persist the successful drafts of a batch in one write"""
+    drafts = [
+        {"recipient": requests[i].recipient, "subject": requests[i].subject, "content": result["draft"]}
+        for i, result in sorted(results.items())
+        if result["status"] == "success"
+    ]
+    if not drafts:
+        return 0
+    try:
+        with stage("email.save"):
+            save_email_drafts(drafts)
+        return len(drafts)
+    except Exception as e:
+        logger.warning(f"Merged drafts not saved: {str(e)}")
+        return 0
+
+
+async def stream_merged(requests: List[EmailRequest], tasks: List[asyncio.Task]):
+    """One ``result`` event per recipient as its draft finishes, then a bulk save"""
+    results = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            results[index] = result
+            yield sse_event({"index": index, "recipient": requests[index].recipient,
+                             "subject": requests[index].subject, **result}, event="result")
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Drafts finished before a disconnect are still saved, in a worker thread off the event loop
+        save = asyncio.ensure_future(asyncio.to_thread(save_merged, requests, results))
+        _pending_saves.add(save)
+        save.add_done_callback(_pending_saves.discard)
+    saved = await save
+    yield sse_event({"status": "success", "count": len(tasks), "saved": saved}, event="done")
+
+
+@router.post("/draft-batch")
+async def draft_email_batch(request: BatchEmailRequest, stream: bool = False):
+    """Mail merge: one draft per recipient from a shared template, results in order or streamed"""
+    if not OPENROUTER_API_KEY:
+        raise HTTPException(503, "API key missing")
+    if not request.recipients:
+        raise HTTPException(400, "No recipients given")
+    if len(request.recipients) > EMAIL_BATCH_MAX:
+        raise HTTPException(413, f"At most {EMAIL_BATCH_MAX} recipients per batch")
+
+    system_prompt = build_system_prompt(request.tone)  # shared by every recipient
+    requests = []
+    for merge in request.recipients:
+        variables = {"recipient": merge.recipient, **merge.variables}
+        requests.append(EmailRequest(
+            recipient=merge.recipient,
+            subject=fill_template(request.subject, variables),
+            tone=request.tone,
+            details=fill_template(request.details or "", variables)
+        ))
+
+    semaphore = asyncio.Semaphore(EMAIL_BATCH_CONCURRENCY)
+
+    async def run(index: int) -> tuple:
+        return index, await draft_merged(requests[index], system_prompt, semaphore)
+
+    tasks = [asyncio.create_task(run(i)) for i in range(len(requests))]
+    if stream:
+        return sse_response(stream_merged(requests, tasks))
+
+    results = dict(await asyncio.gather(*tasks))
+    saved = await asyncio.to_thread(save_merged, requests, results)
+    return {
+        "results": [
+            {"index": i, "recipient": requests[i].recipient, "subject": requests[i].subject, **results[i]}
+            for i in range(len(requests))
+        ],
+        "saved": saved,
+        "model": LLM_MODEL,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def draft_page(drafts: List[Dict], limit: int) -> dict:
+    return {
+        "drafts": drafts,
+        "next_cursor": drafts[-1]["id"] if len(drafts) == limit else None
+    }
+
+
+@router.get("/drafts")
+async def list_drafts(limit: int = Query(20, ge=1, le=200), cursor: Optional[int] = None):
+    """Newest drafts first; pass ``next_cursor`` back as ``cursor`` for the next page"""
+    drafts = get_email_store().search(before_id=cursor, limit=limit)
+    return draft_page(drafts, limit)
+
+
+@router.get("/drafts/search")
+async def search_drafts(
+    recipient: Optional[str] = None,
+    q: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[int] = None
+):
+    """Filter drafts by recipient, subject/body text and ISO timestamp range"""
+    drafts = get_email_store().search(
+        recipient=recipient,
+        text=q,
+        since=since,
+        until=until,
+        before_id=cursor,
+        limit=limit
+    )
+    return draft_page(drafts, limit)
@@ -5,14 +5,25 @@ import json
 import uuid
 import pandas as pd
 from fastapi import APIRouter, HTTPException
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
-from tqdm import tqdm
-from typing import Dict, List, Set
-from datetime import datetime, timedelta
+from typing import List, Set
+from datetime import datetime
 from app.models.embeddings import get_embedding_model
+from app.models.embedding_service import get_embedding_service
+from app.models.profile_index import (
+    QUESTION_MODEL_FILE,
+    build_profile_index,
+    build_records,
+    fingerprint,
+    load_live_records,
+    load_profile_index,
+    record_text,
+    save_profile_index
+)
+from app.models.question_model import QuestionCooccurrence
 from app.utils.validation import validate_email, validate_phone
+from app.utils.metrics import INDEX_SIZE, SESSIONS, stage
+from app.utils.session_store import get_session_store
+from app.utils.profile_repository import get_profile_repository
 from app.utils.storage import load_profiles, save_profile
 
 router = APIRouter()
@@ -26,50 +37,98 @@ FIELD_MAPPING = {
     "Phone Number": "phone",
     "Startup Name": "startup_name"
 }
+SESSION_TTL = 3600  # seconds of inactivity before a session expires
+PROFILE_INDEX_DIR = os.getenv("PROFILE_INDEX_DIR", "data/profile_index")
+ENCODE_BATCH_SIZE = int(os.getenv("PROFILE_ENCODE_BATCH_SIZE", "64"))
+PROFILE_INDEX_TYPE = os.getenv("PROFILE_INDEX_TYPE", "flat")  # flat | hnsw | ivf
+# Answers that say little about which questions come next; until a real
+# free-text answer exists, suggestions come from the co-occurrence model
+LOW_SIGNAL_FIELDS = {"name", "email", "phone", "startup_name"}
+FREE_TEXT_MIN_WORDS = int(os.getenv("PROFILE_FREE_TEXT_MIN_WORDS", "4"))
 
 # Global state (use DB in production)
 profile_index = None
+question_model = None
+index_fingerprint = None
+index_dirty = False  # live profiles added since the index was last saved
 all_questions = []
 records = []
-active_sessions: Dict[str, Dict] = {}  # session_id: {profile, asked_questions, last_active}
+active_sessions = get_session_store("profile", SESSION_TTL)  # session_id: {profile, asked_questions, last_active}
+_init_lock = asyncio.Lock()
+INDEX_SIZE.set_function(lambda: profile_index.ntotal if profile_index is not None else 0, index="profile")
+SESSIONS.set_function(lambda: len(active_sessions), agent="profile")
 
 
-@router.on_event("startup")
-async def init_profile_agent():
-    """Initialize profile agent on startup"""
-    global profile_index, all_questions, records
+async def ensure_profile_state():
+    """Load the index and question model once, off the event loop"""
+    if profile_index is not None:
+        return
+    async with _init_lock:
+        if profile_index is None:
+            try:
+                await asyncio.to_thread(init_profile_agent)
+            except Exception as e:
+                raise HTTPException(status_code=503, detail=f"Profile agent unavailable: {str(e)}")
+
+
+async def warmup():
+    """Load profile state and the query embedding model before traffic arrives"""
+    await ensure_profile_state()
+    await asyncio.to_thread(get_embedding_model, os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+
+
+def init_profile_agent():
+    """Initialize profile agent state from the saved index or the profiles CSV"""
+    global profile_index, question_model, index_fingerprint, all_questions, records
 
     try:
-        df = pd.read_csv(os.getenv("PROFILES_CSV"))
+        csv_path = os.getenv("PROFILES_CSV")
+        model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        index_fingerprint = fingerprint(csv_path, model_name, PROFILE_INDEX_TYPE)
+
+        # Warm start: reuse the index saved for this exact CSV, model and index type
+        saved = load_profile_index(PROFILE_INDEX_DIR, index_fingerprint)
+        question_model_path = os.path.join(PROFILE_INDEX_DIR, QUESTION_MODEL_FILE)
+        if saved is not None:
+            index, records, all_questions = saved
+            question_model = QuestionCooccurrence.load(question_model_path, index_fingerprint)
+            if question_model is None or len(question_model.answered) != len(records):
+                question_model = QuestionCooccurrence.build(records, all_questions)
+                question_model.save(question_model_path, index_fingerprint)
+            profile_index = index  # set last: a non-None index means the state is complete
+            return
+
+        df = pd.read_csv(csv_path)
         df.columns = df.columns.map(str).str.strip()
         df = df.rename(columns=FIELD_MAPPING)
         all_questions = list(df.columns)
 
-        # Create records
-        for idx, row in df.iterrows():
-            answered = {
-                col: str(row[col]).strip()
-                for col in df.columns
-                if pd.notna(row[col]) and str(row[col]).strip() not in {"", "nan"}
-            }
-            records.append({"id": int(idx), "fields": answered})
-
-        # Build index
-        model = get_embedding_model()
-        emb_vecs = np.vstack([
-            model.encode(" ".join(f"{k}: {v}" for k, v in rec["fields"].items()))
-            for rec in tqdm(records)
-        ]).astype("float32")
-
-        profile_index = faiss.IndexFlatIP(emb_vecs.shape[1])
-        profile_index.add(emb_vecs)
+        # Create records (keeping profiles completed live since the last build)
+        # and build index with batched encoding
+        records = build_records(df)
+        for rec in load_live_records(PROFILE_INDEX_DIR):
+            records.append({**rec, "id": len(records)})
+        index = build_profile_index(
+            records, get_embedding_model(model_name), ENCODE_BATCH_SIZE, PROFILE_INDEX_TYPE
+        )
+        save_profile_index(PROFILE_INDEX_DIR, index, records, all_questions, index_fingerprint)
+        question_model = QuestionCooccurrence.build(records, all_questions)
+        question_model.save(question_model_path, index_fingerprint)
+        profile_index = index
 
     except Exception as e:
         print(f"Profile agent initialization failed: {str(e)}")
         raise
 
 
-def get_next_questions(user_profile: dict, exclude: Set[str]) -> List[str]:
+def has_free_text(user_profile: dict) -> bool:
+    return any(
+        q not in LOW_SIGNAL_FIELDS and len(str(answer).split()) >= FREE_TEXT_MIN_WORDS
+        for q, answer in user_profile.items()
+    )
+
+
+async def get_next_questions(user_profile: dict, exclude: Set[str]) -> List[str]:
     """Get next questions with exclusions"""
     global profile_index, all_questions, records
 
@@ -77,19 +136,20 @@ def get_next_questions(user_profile: dict, exclude: Set[str]) -> List[str]:
         return [q for q in all_questions if q not in exclude][:MAX_SUGGEST]
 
     try:
-        qtext = " ".join(f"{k}: {v}" for k, v in user_profile.items())
-        model = get_embedding_model()
-        qvec = model.encode(qtext, normalize_embeddings=True).astype("float32")
+        blocked = set(user_profile) | set(exclude)
+        if not has_free_text(user_profile):
+            # Early, low-signal answers: precomputed co-occurrence lookup, no embedding
+            with stage("profile.cooccurrence"):
+                suggested = question_model.suggest(user_profile, blocked, MAX_SUGGEST)
+        else:
+            # Same representation as the indexed records: one embedding of the whole profile text
+            with stage("profile.encode"):
+                qvec = await get_embedding_service(normalize=True).embed(record_text(user_profile))
+
+            with stage("profile.search"):
+                _, neighbor_ids = profile_index.search(qvec.reshape(1, -1), TOPK_PROFILES)
+                suggested = question_model.tally(neighbor_ids[0], blocked, MAX_SUGGEST)
 
-        _, neighbor_ids = profile_index.search(qvec.reshape(1, -1), TOPK_PROFILES)
-        question_freq = {}
-
-        for idx in neighbor_ids[0]:
-            for q in records[idx]["fields"]:
-                if q not in user_profile and q not in exclude:
-                    question_freq[q] = question_freq.get(q, 0) + 1
-
-        suggested = [q for q, _ in sorted(question_freq.items(), key=lambda x: -x[1])][:MAX_SUGGEST]
         return suggested if suggested else \
             [q for q in all_questions if q not in exclude][:MAX_SUGGEST]
 
@@ -98,29 +158,44 @@ def get_next_questions(user_profile: dict, exclude: Set[str]) -> List[str]:
         return [q for q in all_questions if q not in exclude][:MAX_SUGGEST]
 
 
+async def add_completed_profile(session_id: str, profile: dict):
+    """Make a finished profile available to recommendations immediately"""
+    global index_dirty
+    with stage("profile.encode"):
+        vec = await get_embedding_service(normalize=True).embed(record_text(profile))
+    with stage("profile.index_add"):
+        profile_index.add(vec.reshape(1, -1))
+    records.append({"id": len(records), "fields": dict(profile), "session_id": session_id})
+    question_model.add_record(profile)
+    index_dirty = True
+
+
 @router.post("/start")
 async def start_profile():
     """Start new profile session"""
+    await ensure_profile_state()
     session_id = str(uuid.uuid4())
-    active_sessions[session_id] = {
+    session = {
         "profile": {},
         "asked_questions": set(),
         "last_active": datetime.now()
     }
-    first_question = get_next_questions({}, set())[0]
-    active_sessions[session_id]["asked_questions"].add(first_question)
+    first_question = (await get_next_questions({}, set()))[0]
+    session["asked_questions"].add(first_question)
+    active_sessions.set(session_id, session)
     return {"session_id": session_id, "question": first_question}
 
 
 @router.post("/submit")
 async def submit_profile_response(session_id: str, question: str, answer: str):
     """Submit profile response with validation"""
+    await ensure_profile_state()
     try:
         # Validate session
-        if session_id not in active_sessions:
+        session = active_sessions.get(session_id)
+        if session is None:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        session = active_sessions[session_id]
         session["last_active"] = datetime.now()
 
         # Validate inputs
@@ -135,15 +210,20 @@ async def submit_profile_response(session_id: str, question: str, answer: str):
         # Update profile state
         session["profile"][question] = answer.strip()
         session["asked_questions"].add(question)
-        save_profile(session_id, session["profile"])
+        with stage("profile.save"):
+            save_profile(session_id, session["profile"])
 
         # Get next question
-        next_qs = get_next_questions(
+        next_qs = await get_next_questions(
             session["profile"],
             session["asked_questions"]
         )
 
         if not next_qs:
+            if not session.get("indexed"):
+                await add_completed_profile(session_id, session["profile"])
+                session["indexed"] = True
+            active_sessions.set(session_id, session)
             return {
                 "status": "complete",
                 "profile": session["profile"],
@@ -152,6 +232,7 @@ async def submit_profile_response(session_id: str, question: str, answer: str):
 
         next_question = next_qs[0]
         session["asked_questions"].add(next_question)
+        active_sessions.set(session_id, session)
 
         return {
             "status": "continue",
@@ -168,22 +249,20 @@ async def submit_profile_response(session_id: str, question: str, answer: str):
 
 @router.on_event("shutdown")
 async def cleanup_sessions():
-    """Clean up session data on shutdown"""
-    # In production, would save sessions to persistent storage
-    active_sessions.clear()
+    """Clean up expired session data on shutdown"""
+    # Live sessions stay in the store so other workers (or a restart) can resume them
+    active_sessions.expire()
+    get_profile_repository().flush()
+    if index_dirty and profile_index is not None:
+        save_profile_index(PROFILE_INDEX_DIR, profile_index, records, all_questions, index_fingerprint)
+        question_model.save(os.path.join(PROFILE_INDEX_DIR, QUESTION_MODEL_FILE), index_fingerprint)
 
 
 # Background task to clean stale sessions
 async def session_cleaner():
     while True:
         await asyncio.sleep(3600)  # Run hourly
-        stale_time = datetime.now() - timedelta(hours=1)
-        to_delete = [
-            sid for sid, session in active_sessions.items()
-            if session["last_active"] < stale_time
-        ]
-        for sid in to_delete:
-            del active_sessions[sid]
+        active_sessions.expire()
 
 
 @router.on_event("startup")
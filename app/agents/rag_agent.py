@@ -1,136 +1,426 @@
 import os
-import faiss
+import asyncio
+import hashlib
+import tempfile
 import numpy as np
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings  # Updated import
-from openai import OpenAI
 from dotenv import load_dotenv
+from app.llm.coalesce import get_completion_coalescer
+from app.llm.gateway import get_llm_gateway
+from app.models.embeddings import get_embedding_model
+from app.models.embedding_service import get_embedding_service
+from app.utils.answer_cache import SemanticAnswerCache
+from app.utils.jobs import Job, JobQueue
+from app.utils.metrics import INDEX_SIZE, registry, stage
+from app.utils.sse import sse_event, sse_response
+from app.utils.vector_store import DocumentVectorStore, chunk_hashes
+import time
 import logging
+from typing import Dict, List
 
 load_dotenv()
 
 # Configuration - UPDATED MODEL NAMES
-EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"  # Better alternative
+EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")  # Better alternative
 LLM_MODEL = "anthropic/claude-3-haiku"  # Verified working model on OpenRouter
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+RAG_DATA_DIR = os.getenv("RAG_DATA_DIR", "data/rag")
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")  # flat | sq16 | sq8 | ivfpq
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "2"))
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+UPLOAD_READ_SIZE = 1024 * 1024
+RAG_LLM_PARAMS = {"temperature": 0.1, "max_tokens": 500}  # Keep responses factual
+ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256"))  # answers kept across all documents
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+QUERY_BATCH_MAX = int(os.getenv("RAG_QUERY_BATCH_MAX", "50"))
+QUERY_BATCH_CONCURRENCY = int(os.getenv("RAG_QUERY_BATCH_CONCURRENCY", "8"))
+TOP_K = 3
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Initialize clients
-embedding_model = HuggingFaceEmbeddings(
-    model_name=EMBEDDING_MODEL,
-    encode_kwargs={"normalize_embeddings": True}
-)
 
-client = OpenAI(
-    api_key=OPENROUTER_API_KEY,
-    base_url="https://openrouter.ai/api/v1"
+class BatchQueryRequest(BaseModel):
+    doc_id: int
+    questions: List[str]
+
+# Document storage: one persistent index across all uploaded documents
+vector_store = DocumentVectorStore(RAG_DATA_DIR, index_type=RAG_INDEX_TYPE)
+ingest_jobs = JobQueue(max_workers=INGEST_WORKERS)
+pending_uploads: Dict[str, str] = {}  # file sha256 -> job_id of an ingestion still running
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_entries=ANSWER_CACHE_SIZE,
+    ttl=ANSWER_CACHE_TTL
+)
+INDEX_SIZE.set_function(lambda: vector_store.index.ntotal if vector_store.index is not None else 0, index="rag")
+registry.gauge("powernest_rag_documents", "Documents in the RAG vector store").set_function(
+    lambda: len(vector_store.docs)
 )
 
-# Document storage
-doc_store = {}
-index = None
 
+async def warmup():
+    """Load the embedding model off the event loop before traffic arrives"""
+    await asyncio.to_thread(get_embedding_model, EMBEDDING_MODEL)
 
-@router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+
+@router.on_event("startup")
+async def load_vector_store():
+    """Reload previously ingested documents instead of re-embedding them"""
     try:
-        # Save temporary file
-        file_ext = file.filename.split(".")[-1].lower()
-        if file_ext != "pdf":
-            raise HTTPException(400, "Only PDF files are currently supported")
+        vector_store.load()
+    except Exception as e:
+        logger.error(f"Vector store load failed: {str(e)}")
+        raise
 
-        temp_path = "temp.pdf"
-        with open(temp_path, "wb") as f:
-            f.write(await file.read())
 
-        # Load and chunk document
-        loader = PyPDFLoader(temp_path)
-        documents = loader.load()
+def ingest_pdf(job: Job, temp_path: str, filename: str, file_hash: str) -> dict:
+    """Parse, chunk and embed a spooled PDF page by page in bounded batches.
+
+    Chunks whose text is already indexed reuse the stored vector instead of
+    being embedded again, so a revised upload only embeds what changed. Only
+    exact (flat) or float16 (sq16) vectors are reused; with a trained sq8 or
+    ivfpq index every chunk is embedded.
+    """
+    try:
+        existing = vector_store.find_document(file_hash)
+        if existing is not None:
+            return duplicate_result(existing)
+
+        job.update(total_pages=len(PdfReader(temp_path).pages), pages_processed=0,
+                   chunks_embedded=0, chunks_reused=0)
 
+        loader = PyPDFLoader(temp_path)
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200
         )
-        chunks = text_splitter.split_documents(documents)
-
-        # Generate embeddings
-        texts = [chunk.page_content for chunk in chunks]
-        embeddings = embedding_model.embed_documents(texts)
-
-        # Create FAISS index
-        dimension = len(embeddings[0])
-        global index
-        index = faiss.IndexFlatL2(dimension)
-        index.add(np.array(embeddings).astype("float32"))
-
-        # Store document
-        doc_id = len(doc_store)
-        doc_store[doc_id] = {
-            "chunks": chunks,
-            "embeddings": embeddings
-        }
 
+        chunks, embedded, hashes, pending = [], [], [], []
+        seen = {}  # chunk hash -> vector embedded earlier in this document
+        counts = {"embedded": 0, "reused": 0}
+
+        def embed_pending():
+            batch_hashes = chunk_hashes([chunk["text"] for chunk in pending])
+            vector_ids, reused_vectors = vector_store.reuse_chunks(batch_hashes)
+            new = {}
+            for i, (chunk_hash, vector_id) in enumerate(zip(batch_hashes.tolist(), vector_ids)):
+                if vector_id < 0 and chunk_hash not in seen:
+                    new.setdefault(chunk_hash, i)
+            if new:
+                with stage("rag.ingest.embed"):
+                    vectors = get_embedding_model(EMBEDDING_MODEL).encode(
+                        [pending[i]["text"] for i in new.values()],
+                        normalize_embeddings=True
+                    )
+                seen.update(zip(new, vectors))
+            reused = iter(reused_vectors)
+            embedded.append(np.vstack([
+                next(reused) if vector_id >= 0 else seen[chunk_hash]
+                for chunk_hash, vector_id in zip(batch_hashes.tolist(), vector_ids)
+            ]))
+            hashes.append(batch_hashes)
+            counts["embedded"] += len(new)
+            counts["reused"] += len(pending) - len(new)
+            chunks.extend(pending)
+            pending.clear()
+            job.update(chunks_embedded=counts["embedded"], chunks_reused=counts["reused"])
+
+        for pages_processed, page in enumerate(loader.lazy_load(), start=1):
+            for chunk in text_splitter.split_documents([page]):
+                pending.append({
+                    "text": chunk.page_content,
+                    "metadata": {"page": chunk.metadata.get("page")}
+                })
+                if len(pending) >= EMBED_BATCH_SIZE:
+                    embed_pending()
+            job.update(pages_processed=pages_processed)
+
+        if pending:
+            embed_pending()
+        if not chunks:
+            raise ValueError("No extractable text found in PDF")
+
+        # Add to the shared index in one block so the doc's IDs stay contiguous
+        with stage("rag.ingest.index"):
+            doc_id = vector_store.add_document(np.vstack(embedded), chunks, filename=filename,
+                                               file_hash=file_hash, hashes=np.concatenate(hashes))
         return {
             "doc_id": doc_id,
             "chunk_count": len(chunks),
-            "status": "success"
+            "chunks_embedded": counts["embedded"],
+            "chunks_reused": counts["reused"]
+        }
+    finally:
+        discard_upload(job, temp_path, file_hash)
+
+
+def duplicate_result(doc_id: int) -> dict:
+    count = vector_store.docs[doc_id]["count"]
+    return {"doc_id": doc_id, "chunk_count": count, "chunks_embedded": 0, "chunks_reused": count, "duplicate": True}
+
+
+def discard_upload(job: Job, temp_path: str, file_hash: str):
+    """Forget a finished or cancelled ingestion and delete its spooled PDF"""
+    if pending_uploads.get(file_hash) == job.id:
+        pending_uploads.pop(file_hash, None)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+@router.post("/upload", status_code=202)
+async def upload_document(file: UploadFile = File(...)):
+    file_ext = file.filename.split(".")[-1].lower()
+    if file_ext != "pdf":
+        raise HTTPException(400, "Only PDF files are currently supported")
+
+    temp_path = None
+    try:
+        # Spool to a unique temp file without holding the whole upload in memory
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            temp_path = f.name
+            while data := await file.read(UPLOAD_READ_SIZE):
+                f.write(data)
+                digest.update(data)
+        file_hash = digest.hexdigest()
+
+        # Identical re-uploads resolve to the existing document or the ingestion already running
+        existing = vector_store.find_document(file_hash)
+        running = ingest_jobs.get(pending_uploads.get(file_hash, ""))
+        if running is not None and running.status not in ("queued", "running"):
+            running = None
+        if existing is not None or running is not None:
+            os.remove(temp_path)
+            if existing is not None:
+                return JSONResponse(status_code=200, content={"status": "completed", **duplicate_result(existing)})
+            return {"job_id": running.id, "status": running.status, "duplicate": True}
+
+        job = ingest_jobs.submit("rag_ingest", lambda job: ingest_pdf(job, temp_path, file.filename, file_hash),
+                                 on_cancel=lambda job: discard_upload(job, temp_path, file_hash),
+                                 filename=file.filename)
+        pending_uploads[file_hash] = job.id
+        return {
+            "job_id": job.id,
+            "status": job.status
         }
 
     except Exception as e:
         logger.error(f"Upload failed: {str(e)}")
-        raise HTTPException(500, f"Document processing error: {str(e)}")
-    finally:
-        if os.path.exists(temp_path):
+        if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
+        raise HTTPException(500, f"Document processing error: {str(e)}")
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+
+@router.on_event("shutdown")
+async def stop_ingest_jobs():
+    # Running ingestions finish first so none adds a document after the final save
+    await asyncio.to_thread(ingest_jobs.shutdown)
+    await asyncio.to_thread(vector_store.close)
+
+
+def build_rag_prompt(context: str, query: str) -> List[Dict]:
+    return [
+        {
+            "role": "system",
+            "content": """You are an expert document analyst. Answer questions based strictly on the provided context.
+
+            Rules:
+            1. Be concise (1-2 sentences max)
+            2. If the answer isn't in the context, say "I couldn't find this information in the document"
+            3. Never hallucinate details"""
+        },
+        {
+            "role": "user",
+            "content": f"Context:\n{context}\n\nQuestion: {query}"
+        }
+    ]
+
+
+async def stream_answer(doc_id: int, query: str, query_embedding, messages: List[Dict]):
+    parts = []
+    start = time.perf_counter()
+    try:
+        async for token in get_llm_gateway().stream(LLM_MODEL, messages, **RAG_LLM_PARAMS):
+            parts.append(token)
+            yield sse_event({"content": token}, event="token")
+    except Exception as e:
+        logger.error(f"Query stream failed: {str(e)}")
+        yield sse_event({"detail": f"Query processing error: {str(e)}"}, event="error")
+        return
+    if ANSWER_CACHE_ENABLED:
+        answer_cache.store(doc_id, query, query_embedding, "".join(parts), time.perf_counter() - start)
+    yield sse_event({"status": "success"}, event="done")
+
+
+async def stream_cached_answer(answer: str):
+    yield sse_event({"content": answer}, event="token")
+    yield sse_event({"status": "success", "cached": True}, event="done")
 
 
 @router.post("/query")
-async def query_document(doc_id: int, query: str):
-    if doc_id not in doc_store or index is None:
+async def query_document(doc_id: int, query: str, stream: bool = False):
+    if not vector_store.has_document(doc_id):
         raise HTTPException(404, "Document not found or not indexed")
 
     try:
-        # Semantic search
-        query_embedding = embedding_model.embed_query(query)
-        D, I = index.search(np.array([query_embedding]).astype("float32"), 3)
+        # Semantic search within this document only
+        with stage("rag.embed"):
+            query_embedding = await get_embedding_service(EMBEDDING_MODEL).embed(query)
+
+        # Reuse the answer to a sufficiently similar earlier question
+        with stage("rag.answer_cache"):
+            cached = answer_cache.lookup(doc_id, query_embedding) if ANSWER_CACHE_ENABLED else None
+        if cached:
+            if stream:
+                return sse_response(stream_cached_answer(cached["answer"]))
+            return {
+                "answer": cached["answer"],
+                "status": "success",
+                "cached": True
+            }
+
+        with stage("rag.search"):
+            hits = vector_store.search(doc_id, query_embedding, k=TOP_K)
 
         # Build context
-        context = "\n\n".join(
-            doc_store[doc_id]["chunks"][idx].page_content
-            for idx in I[0]
-        )
+        with stage("rag.context"):
+            context = "\n\n".join(vector_store.get_texts(doc_id, [chunk_no for chunk_no, _ in hits]))
 
         # Generate response - UPDATED PROMPT ENGINEERING
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert document analyst. Answer questions based strictly on the provided context.
-
-                    Rules:
-                    1. Be concise (1-2 sentences max)
-                    2. If the answer isn't in the context, say "I couldn't find this information in the document"
-                    3. Never hallucinate details"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Context:\n{context}\n\nQuestion: {query}"
-                }
-            ],
-            temperature=0.1,  # Keep responses factual
-            max_tokens=500
-        )
+        messages = build_rag_prompt(context, query)
+        if stream:
+            return sse_response(stream_answer(doc_id, query, query_embedding, messages))
+
+        start = time.perf_counter()
+        with stage("rag.llm"):
+            response = await get_completion_coalescer().complete(
+                model=LLM_MODEL,
+                messages=messages,
+                cache=not ANSWER_CACHE_ENABLED,  # the semantic answer cache already covers repeats
+                **RAG_LLM_PARAMS
+            )
+        answer = response.choices[0].message.content
+        if ANSWER_CACHE_ENABLED:
+            answer_cache.store(doc_id, query, query_embedding, answer, time.perf_counter() - start)
 
         return {
-            "answer": response.choices[0].message.content,
+            "answer": answer,
             "status": "success"
         }
 
     except Exception as e:
         logger.error(f"Query failed: {str(e)}")
-        raise HTTPException(500, f"Query processing error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Query processing error: {str(e)}")
+
+
+@router.get("/index/stats")
+async def index_stats():
+    return vector_store.stats()
+
+
+@router.get("/answer-cache/stats")
+async def answer_cache_stats():
+    return answer_cache.stats()
+
+
+async def answer_with_context(doc_id: int, question: str, query_embedding, context: str,
+                              semaphore: asyncio.Semaphore) -> dict:
+    """One batch question: answer cache first, else an LLM call under the batch's concurrency limit"""
+    with stage("rag.answer_cache"):
+        cached = answer_cache.lookup(doc_id, query_embedding) if ANSWER_CACHE_ENABLED else None
+    if cached:
+        return {"answer": cached["answer"], "status": "success", "cached": True}
+    try:
+        async with semaphore:
+            start = time.perf_counter()
+            with stage("rag.llm"):
+                response = await get_completion_coalescer().complete(
+                    model=LLM_MODEL,
+                    messages=build_rag_prompt(context, question),
+                    cache=not ANSWER_CACHE_ENABLED,
+                    **RAG_LLM_PARAMS
+                )
+        answer = response.choices[0].message.content
+        if ANSWER_CACHE_ENABLED:
+            answer_cache.store(doc_id, question, query_embedding, answer, time.perf_counter() - start)
+        return {"answer": answer, "status": "success"}
+    except Exception as e:
+        logger.error(f"Batch question failed: {str(e)}")
+        return {"answer": None, "status": "error", "error": f"Query processing error: {str(e)}"}
+
+
+async def stream_batch(tasks: List[asyncio.Task]):
+    """One ``result`` event per question as it finishes, tagged with its index"""
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            yield sse_event({"index": index, **result}, event="result")
+        yield sse_event({"status": "success", "count": len(tasks)}, event="done")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/query-batch")
+async def query_document_batch(request: BatchQueryRequest, stream: bool = False):
+    """Answer a list of questions about one document; results in order, or streamed as they finish"""
+    doc_id, questions = request.doc_id, request.questions
+    if not vector_store.has_document(doc_id):
+        raise HTTPException(404, "Document not found or not indexed")
+    if not questions:
+        raise HTTPException(400, "No questions given")
+    if len(questions) > QUERY_BATCH_MAX:
+        raise HTTPException(413, f"At most {QUERY_BATCH_MAX} questions per batch")
+
+    try:
+        # All questions in one forward pass and one matrix search
+        with stage("rag.embed"):
+            query_embeddings = await get_embedding_service(EMBEDDING_MODEL).embed_batch(questions)
+        with stage("rag.search"):
+            hits = vector_store.search_many(doc_id, query_embeddings, k=TOP_K)
+
+        # Questions retrieving the same chunks share one context string
+        with stage("rag.context"):
+            chunk_nos = sorted({chunk_no for doc_hits in hits for chunk_no, _ in doc_hits})
+            texts = dict(zip(chunk_nos, vector_store.get_texts(doc_id, chunk_nos)))
+            contexts = {}
+            for doc_hits in hits:
+                key = tuple(chunk_no for chunk_no, _ in doc_hits)
+                if key not in contexts:
+                    contexts[key] = "\n\n".join(texts[chunk_no] for chunk_no in key)
+    except Exception as e:
+        logger.error(f"Batch query failed: {str(e)}")
+        raise HTTPException(500, f"Query processing error: {str(e)}")
+
+    semaphore = asyncio.Semaphore(QUERY_BATCH_CONCURRENCY)
+
+    async def run(index: int) -> tuple:
+        context = contexts[tuple(chunk_no for chunk_no, _ in hits[index])]
+        return index, await answer_with_context(doc_id, questions[index], query_embeddings[index],
+                                                context, semaphore)
+
+    tasks = [asyncio.create_task(run(i)) for i in range(len(questions))]
+    if stream:
+        return sse_response(stream_batch(tasks))
+
+    results = await asyncio.gather(*tasks)
+    return {
+        "results": [{"index": index, "question": questions[index], **result} for index, result in results],
+        "status": "success"
+    }
@@ -0,0 +1,91 @@
+import os
+import time
+import asyncio
+import logging
+import importlib
+from typing import Dict, List
+
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+# name: (module, route prefix, OpenAPI tag)
+AGENTS = {
+    "rag": ("app.agents.rag_agent", "/rag", "RAG"),
+    "scheduler": ("app.agents.scheduler_agent", "/schedule", "Scheduling"),
+    "email": ("app.agents.email_agent", "/email", "Email"),
+    "profile": ("app.agents.profile_agent", "/profile", "Profiling"),
+    "chat": ("app.agents.chat_agent", "/chat", "Chatbot"),
+}
+ENABLED_AGENTS = [name.strip() for name in os.getenv("ENABLED_AGENTS", ",".join(AGENTS)).split(",") if name.strip()]
+# With warmup off, heavy models load on the first request that needs them
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() == "true"
+
+
+class AgentRegistry:
+    """Imports and mounts only the enabled agents, and warms them up in the background.
+
+    An agent module may define ``async def warmup()`` to load its models;
+    readiness holds until every enabled agent has finished warming up.
+    """
+
+    def __init__(self, enabled: List[str], warmup: bool = True):
+        unknown = [name for name in enabled if name not in AGENTS]
+        if unknown:
+            raise ValueError(f"Unknown agents in ENABLED_AGENTS: {', '.join(unknown)}")
+        self.enabled = list(dict.fromkeys(enabled))
+        self.warmup_enabled = warmup
+        self.modules = {}
+        self.status: Dict[str, str] = {name: "pending" for name in self.enabled}
+        self.errors: Dict[str, str] = {}
+        self.warmup_seconds: Dict[str, float] = {}
+        self._task = None
+
+    def mount(self, app: FastAPI):
+        for name in self.enabled:
+            module_path, prefix, tag = AGENTS[name]
+            module = importlib.import_module(module_path)
+            self.modules[name] = module
+            app.include_router(module.router, prefix=prefix, tags=[tag])
+
+    def start_warmup(self):
+        if self.warmup_enabled:
+            self._task = asyncio.create_task(self.warmup())
+        else:
+            self.status = {name: "ready" for name in self.enabled}
+
+    async def warmup(self):
+        await asyncio.gather(*[self._warmup_agent(name) for name in self.enabled])
+
+    async def _warmup_agent(self, name: str):
+        warmup = getattr(self.modules[name], "warmup", None)
+        if warmup is None:
+            self.status[name] = "ready"
+            return
+        self.status[name] = "warming"
+        start = time.perf_counter()
+        try:
+            await warmup()
+            self.status[name] = "ready"
+        except Exception as e:
+            logger.error(f"Warmup of {name} agent failed: {str(e)}")
+            self.status[name] = "failed"
+            self.errors[name] = str(e)
+        finally:
+            self.warmup_seconds[name] = round(time.perf_counter() - start, 3)
+
+    def ready(self) -> bool:
+        return all(status == "ready" for status in self.status.values())
+
+    def health(self) -> dict:
+        return {
+            "ready": self.ready(),
+            "agents": {
+                name: {
+                    "status": self.status[name],
+                    **({"warmup_seconds": self.warmup_seconds[name]} if name in self.warmup_seconds else {}),
+                    **({"error": self.errors[name]} if name in self.errors else {})
+                }
+                for name in self.enabled
+            }
+        }
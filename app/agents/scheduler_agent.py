@@ -1,16 +1,47 @@
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
 import spacy
-import dateparser
-from dateparser.search import search_dates
 import re
+from app.utils.calendar_index import get_calendar_index
+from app.utils.datetime_extract import extract_datetime, extract_datetimes_iso, preprocess_text
+from app.utils.metrics import stage
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Load English NLP model with improved entity recognition
-nlp = spacy.load("en_core_web_sm")
+# Batch parsing configuration
+SCHEDULE_PARSE_WORKERS = int(os.getenv("SCHEDULE_PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+SCHEDULE_PARSE_CHUNK = int(os.getenv("SCHEDULE_PARSE_CHUNK", "64"))  # commands per worker task
+SCHEDULE_NLP_BATCH_SIZE = int(os.getenv("SCHEDULE_NLP_BATCH_SIZE", "256"))
+SCHEDULE_BATCH_MAX = int(os.getenv("SCHEDULE_BATCH_MAX", "10000"))
+# Person extraction only needs the parser and NER
+BATCH_DISABLED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer"]
+
+# Verb forms for "Method 3" when the lemmatizer is disabled
+SCHEDULING_VERB_LEMMAS = {
+    form: lemma
+    for lemma, forms in {
+        "meet": ["meet", "meets", "meeting", "met"],
+        "schedule": ["schedule", "schedules", "scheduled", "scheduling"],
+        "book": ["book", "books", "booked", "booking"],
+        "call": ["call", "calls", "called", "calling"]
+    }.items()
+    for form in forms
+}
+
+# English NLP model with improved entity recognition, loaded on first use or warmup
+nlp = None
+_nlp_lock = threading.Lock()
+
+parse_pool: Optional[ProcessPoolExecutor] = None
 
 
 class ParseRequest(BaseModel):
@@ -25,18 +56,16 @@ class ParseResponse(BaseModel):
     error: Optional[str] = None
 
 
-def preprocess_text(text: str) -> str:
-    """Normalize text for better parsing"""
-    replacements = {
-        r'\bnoon\b': '12:00 PM',
-        r'\bmidnight\b': '00:00',
-        r'\bmorning\b': '9:00 AM',
-        r'\bevening\b': '6:00 PM',
-        r'\btomorrow\b': (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-    }
-    for pattern, repl in replacements.items():
-        text = re.sub(pattern, repl, text, flags=re.IGNORECASE)
-    return text
+class BatchParseRequest(BaseModel):
+    commands: List[str]
+
+
+class BookRequest(BaseModel):
+    command: Optional[str] = None  # e.g. "Meet John tomorrow at 3pm"; fills person/start
+    person: Optional[str] = None
+    start: Optional[str] = None  # ISO datetime or natural language
+    duration_minutes: int = Field(30, gt=0, le=24 * 60)
+    title: Optional[str] = None
 
 
 def is_valid_name(text: str) -> bool:
@@ -67,7 +96,7 @@ def extract_person(doc) -> Optional[str]:
 
     # Method 3: Direct object of scheduling verbs
     for token in doc:
-        if token.dep_ in ("dobj", "pobj") and token.head.lemma_ in ["meet", "schedule", "book", "call"]:
+        if token.dep_ in ("dobj", "pobj") and _lemma(token.head) in ["meet", "schedule", "book", "call"]:
             if is_valid_name(token.text):
                 return token.text
 
@@ -83,35 +112,94 @@ def extract_person(doc) -> Optional[str]:
     return None
 
 
-def extract_datetime(text: str) -> Optional[datetime]:
-    """Robust datetime parsing with context awareness"""
-    try:
-        dates = search_dates(
-            text,
-            languages=['en'],
-            settings={
-                'PREFER_DAY_OF_MONTH': 'first',
-                'RELATIVE_BASE': datetime.now(),
-                'RETURN_AS_TIMEZONE_AWARE': True,
-                'PREFER_LOCALE_DATE_ORDER': False
-            }
-        )
-        return dates[0][1] if dates else None
-    except Exception:
+def get_nlp():
+    global nlp
+    with _nlp_lock:
+        if nlp is None:
+            nlp = spacy.load("en_core_web_sm")
+    return nlp
+
+
+async def warmup():
+    """Load spaCy off the event loop"""
+    await asyncio.to_thread(get_nlp)
+
+
+def _lemma(token) -> str:
+    return token.lemma_ or SCHEDULING_VERB_LEMMAS.get(token.lower_, token.lower_)
+
+
+def clean_person(person: Optional[str]) -> Optional[str]:
+    # Final validation to ensure we didn't capture a verb as name
+    if person and any(word in person.lower() for word in ["meet", "schedule", "book"]):
         return None
+    return person
+
+
+def parse_command(command: str) -> Tuple[Optional[str], Optional[datetime]]:
+    """Person and datetime from an already preprocessed command"""
+    with stage("schedule.nlp"):
+        person = clean_person(extract_person(get_nlp()(command)))
+    with stage("schedule.datetime"):
+        dt = extract_datetime(command)
+    return person, dt
+
+
+def extract_persons(commands: List[str]) -> List[Optional[str]]:
+    """Stream commands through nlp.pipe with only the needed components"""
+    pipeline = get_nlp()
+    disabled = [name for name in BATCH_DISABLED_COMPONENTS if name in pipeline.pipe_names]
+    return [
+        clean_person(extract_person(doc))
+        for doc in pipeline.pipe(commands, batch_size=SCHEDULE_NLP_BATCH_SIZE, disable=disabled)
+    ]
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Datetime extraction workers; spawned so they never inherit spaCy or model state"""
+    global parse_pool
+    if parse_pool is None and SCHEDULE_PARSE_WORKERS > 0:
+        parse_pool = ProcessPoolExecutor(
+            max_workers=SCHEDULE_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return parse_pool
+
+
+async def extract_datetimes(commands: List[str]) -> List[Optional[str]]:
+    """ISO datetimes for all commands, chunked across the process pool, in order"""
+    loop = asyncio.get_running_loop()
+    chunks = [commands[i:i + SCHEDULE_PARSE_CHUNK] for i in range(0, len(commands), SCHEDULE_PARSE_CHUNK)]
+    results = await asyncio.gather(*[
+        loop.run_in_executor(get_parse_pool(), extract_datetimes_iso, chunk) for chunk in chunks
+    ])
+    return [dt for chunk in results for dt in chunk]
+
+
+def parse_when(value: str) -> datetime:
+    """ISO datetime, falling back to natural language"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        dt = extract_datetime(preprocess_text(value))
+        if dt is None:
+            raise HTTPException(status_code=400, detail=f"Could not understand time: {value}")
+        return dt
+
+
+def slot_dict(start: datetime, end: datetime) -> dict:
+    return {"start": start.astimezone().isoformat(), "end": end.astimezone().isoformat()}
+
+
+def event_dict(event: dict) -> dict:
+    return {"uid": event["uid"], "summary": event["summary"], **slot_dict(event["start"], event["end"])}
 
 
 @router.post("/parse", response_model=ParseResponse)
 async def parse_appointment(request: ParseRequest):
     command = preprocess_text(request.command.strip())
     try:
-        doc = nlp(command)
-        person = extract_person(doc)
-        dt = extract_datetime(command)
-
-        # Final validation to ensure we didn't capture a verb as name
-        if person and any(word in person.lower() for word in ["meet", "schedule", "book"]):
-            person = None
+        person, dt = parse_command(command)
 
         return ParseResponse(
             person=person,
@@ -124,4 +212,91 @@ async def parse_appointment(request: ParseRequest):
             success=False,
             error=f"Parsing failed: {str(e)}",
             parsed_command=command
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/parse-batch", response_model=List[ParseResponse])
+async def parse_appointments(request: BatchParseRequest):
+    """Parse many commands at once; results are returned in request order"""
+    if len(request.commands) > SCHEDULE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SCHEDULE_BATCH_MAX} commands per batch")
+    commands = [preprocess_text(command.strip()) for command in request.commands]
+    try:
+        # Person extraction (one thread) overlaps datetime extraction (worker processes)
+        with stage("schedule.batch"):
+            persons, datetimes = await asyncio.gather(
+                asyncio.to_thread(extract_persons, commands),
+                extract_datetimes(commands)
+            )
+    except Exception as e:
+        logger.error(f"Batch parse failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch parsing failed: {str(e)}")
+
+    return [
+        ParseResponse(person=person, datetime=dt, parsed_command=command, success=bool(dt))
+        for command, person, dt in zip(commands, persons, datetimes)
+    ]
+
+
+@router.on_event("shutdown")
+def shutdown_parse_pool():
+    if parse_pool is not None:
+        parse_pool.shutdown(cancel_futures=True)
+
+
+@router.post("/book")
+async def book_appointment(request: BookRequest):
+    """Book a meeting if the slot is free, otherwise report conflicts and alternatives"""
+    person, start = request.person, parse_when(request.start) if request.start else None
+    if request.command:
+        parsed_person, parsed_start = parse_command(preprocess_text(request.command.strip()))
+        person = person or parsed_person
+        start = start or parsed_start
+    if start is None:
+        raise HTTPException(status_code=400, detail="No meeting time given or understood")
+
+    duration = timedelta(minutes=request.duration_minutes)
+    title = request.title or (f"Meeting with {person}" if person else "Meeting")
+    calendar = get_calendar_index()
+    try:
+        with stage("schedule.book"):
+            event, conflicts = await asyncio.to_thread(
+                calendar.book, start, start + duration, title, request.command
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Booking failed: {str(e)}")
+
+    if conflicts:
+        alternatives = await asyncio.to_thread(calendar.free_slots, duration, start, 3)
+        raise HTTPException(status_code=409, detail={
+            "message": "Requested time conflicts with existing events",
+            "conflicts": [event_dict(e) for e in conflicts],
+            "alternatives": [slot_dict(s, e) for s, e in alternatives]
+        })
+
+    return {
+        "booked": True,
+        "uid": str(event["uid"]),
+        "summary": title,
+        "person": person,
+        **slot_dict(event.decoded("dtstart"), event.decoded("dtend"))
+    }
+
+
+@router.get("/free-slots")
+async def free_slots(
+    duration_minutes: int = Query(30, gt=0, le=24 * 60),
+    after: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(5, ge=1, le=50)
+):
+    """Earliest free slots of the given length within working hours"""
+    start = parse_when(after) if after else datetime.now().astimezone()
+    end = parse_when(until) if until else None
+    slots = await asyncio.to_thread(
+        get_calendar_index().free_slots, timedelta(minutes=duration_minutes), start, limit, end
+    )
+    return {
+        "duration_minutes": duration_minutes,
+        "slots": [slot_dict(s, e) for s, e in slots]
+    }
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.llm.gateway import get_llm_gateway
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() == "true"
+LLM_COMPLETION_CACHE_SIZE = int(os.getenv("LLM_COMPLETION_CACHE_SIZE", "512"))  # 0 disables the cache
+LLM_COMPLETION_CACHE_TTL = float(os.getenv("LLM_COMPLETION_CACHE_TTL", "600"))
+# Only near-deterministic calls are cached; sampled ones are still coalesced
+LLM_COMPLETION_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_COMPLETION_CACHE_MAX_TEMPERATURE", "0.2"))
+
+SHARED = registry.counter(
+    "powernest_llm_shared_completions_total", "Completions served without an upstream call", ("model", "source")
+)
+
+_coalescer = None
+
+
+def request_key(model: str, messages: List[Dict], params: Dict) -> str:
+    """Stable hash of a completion request"""
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CompletionCoalescer:
+    """Single-flight layer over ``LLMGateway.complete`` with an exact-match TTL cache.
+
+    Concurrent identical requests await one upstream call. The call runs as
+    its own task, so a caller disconnecting does not cancel it for the
+    others. Responses to calls at or below ``max_temperature`` are kept for
+    ``ttl`` seconds in a bounded LRU; callers with their own answer cache pass
+    ``cache=False`` to get coalescing only.
+    """
+
+    def __init__(self, cache_size: int = LLM_COMPLETION_CACHE_SIZE, ttl: float = LLM_COMPLETION_CACHE_TTL,
+                 max_temperature: float = LLM_COMPLETION_CACHE_MAX_TEMPERATURE):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._cache: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def _cacheable(self, params: Dict) -> bool:
+        return self.cache_size > 0 and params.get("temperature", 1.0) <= self.max_temperature
+
+    def _cached(self, key: str) -> Optional[object]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return response
+
+    def _store(self, key: str, response):
+        self._cache[key] = (time.monotonic() + self.ttl, response)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def complete(self, model: str, messages: List[Dict], cache: bool = True, **params):
+        if not LLM_COALESCE_ENABLED:
+            return await get_llm_gateway().complete(model=model, messages=messages, **params)
+
+        key = request_key(model, messages, params)
+        self.calls += 1
+        cacheable = cache and self._cacheable(params)
+        if cacheable:
+            response = self._cached(key)
+            if response is not None:
+                self.cache_hits += 1
+                SHARED.inc(model=model, source="cache")
+                return response
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            SHARED.inc(model=model, source="in_flight")
+        else:
+            task = asyncio.ensure_future(get_llm_gateway().complete(model=model, messages=messages, **params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done, cacheable))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task, cacheable: bool):
+        self._in_flight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:  # retrieved here too, in case every caller went away
+            return
+        if cacheable:
+            self._store(key, task.result())
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": LLM_COALESCE_ENABLED,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "in_flight": len(self._in_flight),
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+            "ttl": self.ttl,
+            "max_temperature": self.max_temperature
+        }
+
+
+def get_completion_coalescer() -> CompletionCoalescer:
+    """Singleton coalescer shared by all agents"""
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = CompletionCoalescer()
+    return _coalescer
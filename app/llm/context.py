@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Set
+
+from app.utils.session_store import SessionStore
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional dependency; fall back to a character heuristic
+    _encoding = None
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# The event loop only keeps weak references to tasks; hold summaries until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+SUMMARY_PROMPT = """Summarize the earlier part of this conversation for your own future reference.
+Keep names, facts, decisions and open questions; drop greetings and filler.
+Reply with the summary only, in at most 150 words."""
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, otherwise ~4 characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    return sum(count_tokens(m["content"] or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class ChatContextManager:
+    """Keeps a chat session's prompt within a token budget.
+
+    A session's ``history`` holds the system prompt followed by the turns not
+    yet summarized. Once the history exceeds ``budget_tokens``, every turn but
+    the last ``keep_messages`` is folded into ``summary`` by a background task,
+    so the reply that triggered it is never delayed.
+    """
+
+    def __init__(self, sessions: SessionStore, summarize_fn: Callable[[List[Dict]], Awaitable[str]],
+                 budget_tokens: int = 2000, keep_messages: int = 6):
+        self.sessions = sessions
+        self.summarize_fn = summarize_fn
+        self.budget_tokens = budget_tokens
+        self.keep_messages = keep_messages
+        self._summarizing: Set[str] = set()
+
+    @staticmethod
+    def init_session(session: dict):
+        session.setdefault("summary", "")
+        session["tokens"] = count_message_tokens(session["history"])
+
+    @staticmethod
+    def append(session: dict, message: Dict):
+        session["history"].append(message)
+        session["tokens"] = session.get("tokens", 0) + count_message_tokens([message])
+
+    @staticmethod
+    def build_messages(session: dict) -> List[Dict]:
+        """System prompt, running summary (if any) and the verbatim recent turns"""
+        history = session["history"]
+        if not session.get("summary"):
+            return list(history)
+        return [
+            history[0],
+            {"role": "system", "content": f"Summary of the earlier conversation: {session['summary']}"},
+            *history[1:]
+        ]
+
+    def maybe_summarize(self, session_id: str, session: dict):
+        """Schedule background summarization if the session is over budget"""
+        if session.get("tokens", 0) <= self.budget_tokens or session_id in self._summarizing:
+            return
+        if len(session["history"]) - 1 <= self.keep_messages:
+            return
+        self._summarizing.add(session_id)
+        task = asyncio.create_task(self._summarize(session_id, session))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def _summarize(self, session_id: str, session: dict):
+        try:
+            history = session["history"]
+            folded = history[1:len(history) - self.keep_messages]
+            transcript = []
+            if session.get("summary"):
+                transcript.append({"role": "system", "content": f"Summary so far: {session['summary']}"})
+            transcript.extend(folded)
+
+            summary = await self.summarize_fn(transcript)
+
+            # Reload: the session may have moved on (or been stored elsewhere) meanwhile.
+            # Turns are only ever appended, so the folded ones are still at the front.
+            session = self.sessions.get(session_id)
+            if session is None:
+                return
+            history = session["history"]
+            if history[1:1 + len(folded)] == folded:
+                del history[1:1 + len(folded)]
+                session["summary"] = summary.strip()
+                session["tokens"] = count_message_tokens(history) + count_tokens(session["summary"])
+                self.sessions.set(session_id, session)
+        except Exception as e:
+            logger.warning(f"Summarizing session {session_id} failed: {str(e)}")
+        finally:
+            self._summarizing.discard(session_id)
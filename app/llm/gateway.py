@@ -0,0 +1,231 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+from app.utils.metrics import LLM_ERRORS, LLM_RETRIES, LLM_SECONDS, LLM_TOKENS, LLM_TTFT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Per-model overrides, e.g. "anthropic/claude-3-haiku=32,openai/gpt-4o=8"
+LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")
+
+RETRY_STATUS_CODES = {408, 409, 429}
+
+_gateway = None
+
+
+def _parse_model_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, limit = item.rpartition("=")
+        if model and limit.isdigit():
+            limits[model] = int(limit)
+    return limits
+
+
+class LLMGateway:
+    """Shared async client for OpenAI-compatible chat completions.
+
+    One pooled HTTP connection set serves every agent; each model gets its own
+    concurrency semaphore, and 429/5xx/transport failures are retried with
+    jittered exponential backoff. Latency and token usage are tallied per model.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str = LLM_BASE_URL,
+                 timeout: float = LLM_TIMEOUT, max_retries: int = LLM_MAX_RETRIES,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 model_concurrency: Optional[Dict[str, int]] = None,
+                 max_connections: int = LLM_MAX_CONNECTIONS):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout)
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key or "missing",
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,  # retries are handled here so they respect the semaphores
+            timeout=timeout
+        )
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency or {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, dict] = {}
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(
+                self.model_concurrency.get(model, self.max_concurrency)
+            )
+        return self._semaphores[model]
+
+    def _model_stats(self, model: str) -> dict:
+        return self._stats.setdefault(model, {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "streams": 0,
+            "total_ttft": 0.0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        })
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (APIConnectionError, APITimeoutError)):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRY_STATUS_CODES or error.status_code >= 500
+        return False
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given"""
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), LLM_BACKOFF_MAX)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def _record(self, model: str, latency: float, usage):
+        stats = self._model_stats(model)
+        stats["calls"] += 1
+        stats["total_latency"] += latency
+        stats["max_latency"] = max(stats["max_latency"], latency)
+        LLM_SECONDS.observe(latency, model=model)
+        if usage is not None:
+            stats["prompt_tokens"] += usage.prompt_tokens or 0
+            stats["completion_tokens"] += usage.completion_tokens or 0
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+    async def complete(self, model: str, messages: List[Dict], **params):
+        """Chat completion with per-model concurrency limits and retries"""
+        stats = self._model_stats(model)
+        async with self._semaphore(model):
+            stats["in_flight"] += 1
+            try:
+                for attempt in range(self.max_retries + 1):
+                    start = time.perf_counter()
+                    try:
+                        response = await self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            **params
+                        )
+                    except Exception as e:
+                        if attempt < self.max_retries and self._is_retryable(e):
+                            stats["retries"] += 1
+                            LLM_RETRIES.inc(model=model)
+                            delay = self._backoff(attempt, e)
+                            logger.warning(f"LLM call to {model} failed ({str(e)}), retrying in {delay:.2f}s")
+                            await asyncio.sleep(delay)
+                            continue
+                        stats["errors"] += 1
+                        LLM_ERRORS.inc(model=model)
+                        raise
+                    self._record(model, time.perf_counter() - start, response.usage)
+                    return response
+            finally:
+                stats["in_flight"] -= 1
+
+    async def stream(self, model: str, messages: List[Dict], **params) -> AsyncIterator[str]:
+        """Streamed chat completion yielding content deltas as they arrive.
+
+        Retries only happen before the first token; once output has been
+        forwarded a failure is raised to the caller.
+        """
+        stats = self._model_stats(model)
+        async with self._semaphore(model):
+            stats["in_flight"] += 1
+            try:
+                for attempt in range(self.max_retries + 1):
+                    start = time.perf_counter()
+                    usage = None
+                    started = False
+                    try:
+                        response = await self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            stream=True,
+                            stream_options={"include_usage": True},
+                            **params
+                        )
+                        async for chunk in response:
+                            if chunk.usage is not None:
+                                usage = chunk.usage
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                if not started:
+                                    started = True
+                                    ttft = time.perf_counter() - start
+                                    stats["total_ttft"] += ttft
+                                    LLM_TTFT_SECONDS.observe(ttft, model=model)
+                                yield chunk.choices[0].delta.content
+                    except Exception as e:
+                        if not started and attempt < self.max_retries and self._is_retryable(e):
+                            stats["retries"] += 1
+                            LLM_RETRIES.inc(model=model)
+                            delay = self._backoff(attempt, e)
+                            logger.warning(f"LLM stream from {model} failed ({str(e)}), retrying in {delay:.2f}s")
+                            await asyncio.sleep(delay)
+                            continue
+                        stats["errors"] += 1
+                        LLM_ERRORS.inc(model=model)
+                        raise
+                    stats["streams"] += 1
+                    self._record(model, time.perf_counter() - start, usage)
+                    return
+            finally:
+                stats["in_flight"] -= 1
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            model: {
+                **stats,
+                "avg_latency": stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0,
+                "avg_ttft": stats["total_ttft"] / stats["streams"] if stats["streams"] else 0.0
+            }
+            for model, stats in self._stats.items()
+        }
+
+    async def aclose(self):
+        await self.client.close()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Singleton LLM gateway shared by all agents"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            model_concurrency=_parse_model_limits(LLM_MODEL_CONCURRENCY)
+        )
+    return _gateway
+
+
+async def close_llm_gateway():
+    global _gateway
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
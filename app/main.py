@@ -1,16 +1,15 @@
 from dotenv import load_dotenv
 load_dotenv()
 import os
-from .agents import chat_agent
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
-from .agents import (
-    rag_agent,
-    scheduler_agent,
-    email_agent,
-    profile_agent
-)
+from .agents.registry import AGENT_WARMUP, ENABLED_AGENTS, AgentRegistry
+from .llm.coalesce import get_completion_coalescer
+from .llm.gateway import get_llm_gateway, close_llm_gateway
+from .models.embedding_cache import get_embedding_cache
+from .utils.metrics import METRICS_ENABLED, MetricsMiddleware, registry
 
 load_dotenv()
 
@@ -28,18 +27,54 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+# Include routers of the enabled agents only (ENABLED_AGENTS)
+agents = AgentRegistry(ENABLED_AGENTS, warmup=AGENT_WARMUP)
+agents.mount(app)
 
-# Include routers
-app.include_router(rag_agent.router, prefix="/rag", tags=["RAG"])
-app.include_router(scheduler_agent.router, prefix="/schedule", tags=["Scheduling"])
-app.include_router(email_agent.router, prefix="/email", tags=["Email"])
-app.include_router(profile_agent.router, prefix="/profile", tags=["Profiling"])
-app.include_router(chat_agent.router, prefix="/chat", tags=["Chatbot"])
+@app.on_event("startup")
+async def warm_up_agents():
+    # Runs in the background so the process answers liveness checks immediately
+    agents.start_warmup()
 
 @app.get("/")
 async def root():
     return {"message": "AI Agent Platform - Operational"}
 
+@app.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    health = agents.health()
+    return JSONResponse(status_code=200 if health["ready"] else 503, content=health)
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text format; stage, route, LLM, index and session metrics
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/embedding-cache/stats")
+async def embedding_cache_stats():
+    cache = get_embedding_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return get_llm_gateway().stats()
+
+@app.get("/llm/cache/stats")
+async def llm_cache_stats():
+    return get_completion_coalescer().stats()
+
+@app.on_event("shutdown")
+async def shutdown_llm_gateway():
+    await close_llm_gateway()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,192 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.db import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Hits record last_used in memory; written in one transaction at most this often
+TOUCH_FLUSH_INTERVAL = float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL", "30"))
+TOUCH_FLUSH_MAX = 1000  # or once this many keys are pending
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially reformatted chunks share a cache entry"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model, hash of normalized text) with an LRU cap.
+
+    Lookups only read. ``last_used`` updates from hits are batched in memory
+    and written with the next put or every TOUCH_FLUSH_INTERVAL seconds, and
+    the row count is tracked as rows are inserted, so a fully cached query
+    never takes SQLite's write lock. The count is re-read from the table on
+    each touch flush and before evicting, since other workers insert too.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000, touch_interval: float = TOUCH_FLUSH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key -> last_used not yet written
+        self._touched_at = time.monotonic()
+
+        self.conn = connect_sqlite(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+        self._count = self._count_rows()
+
+    @staticmethod
+    def make_key(model_key: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_key}:{digest}"
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = list(keys[start:start + 500])
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                found.update((key, np.frombuffer(blob, dtype="float32")) for key, blob in rows)
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if len(self._touched) >= TOUCH_FLUSH_MAX or time.monotonic() - self._touched_at >= self.touch_interval:
+                    self._write_touches()
+                    self._count = self._count_rows()
+                    self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        now = time.time()
+        with self._lock:
+            # A key's vector never changes, so a row another worker already wrote is kept
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vec, dtype="float32").tobytes(), now)
+                    for key, vec in zip(keys, vectors)
+                ]
+            )
+            self._count += max(cursor.rowcount, 0)
+            self._write_touches()  # already in a write transaction
+            if self._count > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def _count_rows(self) -> int:
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def _write_touches(self):
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def _evict(self):
+        overflow = self._count_rows() - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+        self._count = self._count_rows()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._count_rows()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "max_entries": self.max_entries
+            }
+
+
+def cached_encode(cache: Optional[EmbeddingCache], model_key: str, texts: List[str],
+                  encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+    """Embed texts, encoding only the cache misses in a single batch"""
+    if cache is None:
+        return np.asarray(encode_fn(texts), dtype="float32")
+
+    keys = [cache.make_key(model_key, text) for text in texts]
+    vectors = cache.get_many(keys)
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    if missing:
+        # Encode each distinct missing text once
+        unique = {}
+        for i in missing:
+            unique.setdefault(keys[i], texts[i])
+        encoded = np.asarray(encode_fn(list(unique.values())), dtype="float32")
+        by_key = dict(zip(unique.keys(), encoded))
+        cache.put_many(list(by_key.keys()), encoded)
+        for i in missing:
+            vectors[i] = by_key[keys[i]]
+    if not vectors:
+        return np.empty((0, 0), dtype="float32")
+    return np.vstack(vectors)
+
+
+class CachedSentenceTransformer:
+    """SentenceTransformer wrapper whose encode() consults the embedding cache first"""
+
+    def __init__(self, model, model_name: str, cache: Optional[EmbeddingCache] = None):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def encode(self, sentences, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        model_key = f"{self.model_name}|norm={int(normalize_embeddings)}"
+        vectors = cached_encode(
+            self.cache, model_key, texts,
+            lambda batch: self.model.encode(batch, normalize_embeddings=normalize_embeddings, **kwargs)
+        )
+        return vectors[0] if single else vectors
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Singleton for the shared embedding cache (None when disabled)"""
+    global _embedding_cache
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3"),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+            )
+    return _embedding_cache
@@ -0,0 +1,113 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.models.embeddings import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+_services: Dict[Tuple[str, bool], "EmbeddingService"] = {}
+
+
+class EmbeddingService:
+    """Groups concurrent embedding requests into batched encodes run off the event loop.
+
+    Callers await ``embed``/``embed_many``; queued texts are collected until
+    ``max_batch_size`` is reached or ``max_wait_ms`` has passed since the first
+    one arrived, then encoded in a single forward pass on a worker thread.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.batches = 0
+        self.texts = 0
+        self._queue = None
+        self._loop = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embedding for one text"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for several texts, batched together with other callers"""
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        return np.vstack(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for a caller's whole batch in one forward pass, skipping the queue"""
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        vectors = await asyncio.get_running_loop().run_in_executor(self.executor, self.encode_fn, texts)
+        self.batches += 1
+        self.texts += len(texts)
+        return np.asarray(vectors, dtype="float32")
+
+    async def _run(self):
+        while True:
+            pending = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in pending]
+            try:
+                vectors = await self._loop.run_in_executor(self.executor, self.encode_fn, texts)
+                self.batches += 1
+                self.texts += len(texts)
+                for (_, future), vec in zip(pending, vectors):
+                    if not future.done():
+                        future.set_result(np.asarray(vec, dtype="float32"))
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} failed: {str(e)}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0
+        }
+
+
+def get_embedding_service(model_name: str = None, normalize: bool = True) -> EmbeddingService:
+    """Shared micro-batching service per (model, normalization), reusing the loaded model"""
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    key = (model_name, normalize)
+    if key not in _services:
+        # The model is loaded on the worker thread by the first batch, not on the event loop
+        _services[key] = EmbeddingService(
+            lambda texts: get_embedding_model(model_name).encode(texts, normalize_embeddings=normalize)
+        )
+    return _services[key]
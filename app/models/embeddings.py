@@ -1,12 +1,16 @@
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+from app.models.embedding_cache import CachedSentenceTransformer
 
-_embedding_model = None
+_embedding_models = {}
+_embedding_models_lock = threading.Lock()
 
-def get_embedding_model():
-    """Singleton for embedding model"""
-    global _embedding_model
-    if _embedding_model is None:
-        model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-        _embedding_model = SentenceTransformer(model_name)
-    return _embedding_model
\ No newline at end of file
+def get_embedding_model(model_name: str = None):
+    """Per-process singleton for each embedding model, backed by the shared embedding cache"""
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    with _embedding_models_lock:
+        if model_name not in _embedding_models:
+            # Imported here so agents that never embed do not pay for torch
+            from sentence_transformers import SentenceTransformer
+            _embedding_models[model_name] = CachedSentenceTransformer(SentenceTransformer(model_name), model_name)
+        return _embedding_models[model_name]
\ No newline at end of file
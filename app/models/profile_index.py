@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bump when the record or vector layout changes so saved indexes get rebuilt
+INDEX_FORMAT_VERSION = 2
+
+# Approximate index settings (PROFILE_INDEX_TYPE = flat | hnsw | ivf)
+HNSW_M = int(os.getenv("PROFILE_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("PROFILE_HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("PROFILE_HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("PROFILE_IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("PROFILE_IVF_NPROBE", "16"))
+
+INDEX_FILE = "index.faiss"
+RECORDS_FILE = "records.json"
+META_FILE = "meta.json"
+QUESTION_MODEL_FILE = "questions.npz"
+
+
+def fingerprint(csv_path: str, model_name: str, index_type: str = "flat") -> str:
+    """Identity of a profile index: CSV contents, embedding model, index type and format version"""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(f"|{model_name}|{index_type}|v{INDEX_FORMAT_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def make_index(vectors: np.ndarray, index_type: str = "flat") -> faiss.Index:
+    """Inner-product index over normalized vectors: exact, HNSW graph or IVF clusters"""
+    dim = vectors.shape[1]
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivf":
+        # Roughly sqrt(n) clusters, with enough training points per cluster
+        nlist = max(1, min(IVF_NLIST, int(np.sqrt(len(vectors))), len(vectors) // 39))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    elif index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    else:
+        raise ValueError(f"Unknown profile index type: {index_type}")
+    configure_search(index)
+    index.add(vectors)
+    return index
+
+
+def configure_search(index: faiss.Index):
+    """Apply the configured search-time accuracy/latency knobs"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(IVF_NPROBE, index.nlist)
+
+
+def build_records(df: pd.DataFrame) -> List[dict]:
+    """One record per row holding only the answered (non-empty) fields"""
+    values = df.astype(str).apply(lambda col: col.str.strip())
+    answered = df.notna() & ~values.isin(["", "nan"])
+    columns = list(df.columns)
+    return [
+        {"id": int(idx), "fields": {col: val for col, val, keep in zip(columns, row_vals, row_mask) if keep}}
+        for idx, row_vals, row_mask in zip(df.index, values.to_numpy(), answered.to_numpy())
+    ]
+
+
+def record_text(fields: dict) -> str:
+    return " ".join(f"{k}: {v}" for k, v in fields.items())
+
+
+def save_profile_index(directory: str, index: faiss.Index, records: List[dict],
+                       questions: List[str], index_fingerprint: str):
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(index, os.path.join(directory, f"{INDEX_FILE}.tmp"))
+    os.replace(os.path.join(directory, f"{INDEX_FILE}.tmp"), os.path.join(directory, INDEX_FILE))
+    with open(os.path.join(directory, f"{RECORDS_FILE}.tmp"), "w") as f:
+        json.dump({"questions": questions, "records": records}, f)
+    os.replace(os.path.join(directory, f"{RECORDS_FILE}.tmp"), os.path.join(directory, RECORDS_FILE))
+    # Written last: a fingerprint on disk means the files beside it are complete
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump({
+            "fingerprint": index_fingerprint,
+            "index_type": index_kind(index),
+            "count": index.ntotal
+        }, f)
+
+
+def index_kind(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def load_live_records(directory: str) -> List[dict]:
+    """Profiles added at runtime to a previously saved index, to carry over a rebuild"""
+    try:
+        with open(os.path.join(directory, RECORDS_FILE), "r") as f:
+            return [rec for rec in json.load(f)["records"] if rec.get("session_id")]
+    except (FileNotFoundError, ValueError, KeyError):
+        return []
+
+
+def load_profile_index(directory: str, index_fingerprint: str) -> Optional[Tuple[faiss.Index, List[dict], List[str]]]:
+    """Read a saved index into memory if it was built from the same CSV and model"""
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != index_fingerprint:
+            logger.info("Profile CSV or model changed, rebuilding profile index")
+            return None
+        index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+        configure_search(index)
+        with open(os.path.join(directory, RECORDS_FILE), "r") as f:
+            saved = json.load(f)
+        return index, saved["records"], saved["questions"]
+    except Exception as e:
+        logger.warning(f"Saved profile index unusable, rebuilding: {str(e)}")
+        return None
+
+
+def build_profile_index(records: List[dict], model, batch_size: int = 64,
+                        index_type: str = "flat") -> faiss.Index:
+    """Encode all records in normalized batches and index them"""
+    emb_vecs = np.asarray(model.encode(
+        [record_text(rec["fields"]) for rec in records],
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        show_progress_bar=True
+    ), dtype="float32")
+    return make_index(emb_vecs, index_type)
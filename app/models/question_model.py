@@ -0,0 +1,162 @@
+import os
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Questions with at most this many distinct answers get per-answer statistics
+MAX_CATEGORICAL_VALUES = int(os.getenv("PROFILE_MAX_CATEGORICAL_VALUES", "20"))
+
+
+class QuestionCooccurrence:
+    """Precomputed question statistics over the profile records.
+
+    ``answered`` is a records x questions 0/1 matrix; alongside it we keep
+    per-question answer counts and the question co-occurrence matrix, so
+    P(q answered | a answered) is ``cooc[a, q] / counts[a]``. Low-cardinality
+    questions also get a row per distinct answer value, giving
+    P(q answered | a == value).
+    """
+
+    def __init__(self, questions: List[str]):
+        self.questions = list(questions)
+        self.position = {q: i for i, q in enumerate(self.questions)}
+        n = len(self.questions)
+        self._answered = np.zeros((0, n), dtype="uint8")  # capacity doubles as live records arrive
+        self._rows = 0
+        self.counts = np.zeros(n, dtype="float32")
+        self.cooc = np.zeros((n, n), dtype="float32")
+        self.value_keys: Dict[tuple, int] = {}  # (question, value) -> row of value_cooc
+        self.value_counts = np.zeros(0, dtype="float32")
+        self.value_cooc = np.zeros((0, n), dtype="float32")
+
+    @property
+    def answered(self) -> np.ndarray:
+        return self._answered[:self._rows]
+
+    @answered.setter
+    def answered(self, value: np.ndarray):
+        self._answered = value
+        self._rows = len(value)
+
+    @classmethod
+    def build(cls, records: List[dict], questions: List[str]) -> "QuestionCooccurrence":
+        model = cls(questions)
+        answered = np.zeros((len(records), len(questions)), dtype="float32")
+        for row, rec in enumerate(records):
+            for q in rec["fields"]:
+                if q in model.position:
+                    answered[row, model.position[q]] = 1.0
+        model.answered = answered.astype("uint8")
+        model.counts = answered.sum(axis=0)
+        model.cooc = answered.T @ answered
+
+        # Per-value rows for questions with few distinct answers
+        values_by_question: Dict[str, set] = {}
+        for rec in records:
+            for q, v in rec["fields"].items():
+                if q in model.position:
+                    values_by_question.setdefault(q, set()).add(v.lower())
+        categorical = {q for q, values in values_by_question.items() if len(values) <= MAX_CATEGORICAL_VALUES}
+        for q in sorted(categorical):
+            for v in sorted(values_by_question[q]):
+                model.value_keys[(q, v)] = len(model.value_keys)
+
+        indicator = np.zeros((len(records), len(model.value_keys)), dtype="float32")
+        for row, rec in enumerate(records):
+            for q, v in rec["fields"].items():
+                key = model.value_keys.get((q, v.lower()))
+                if key is not None:
+                    indicator[row, key] = 1.0
+        model.value_counts = indicator.sum(axis=0)
+        model.value_cooc = indicator.T @ answered
+        return model
+
+    def add_record(self, fields: dict):
+        """Fold one more record (e.g. a profile completed live) into the counts"""
+        vec = np.zeros(len(self.questions), dtype="float32")
+        for q in fields:
+            if q in self.position:
+                vec[self.position[q]] = 1.0
+        if self._rows == len(self._answered):
+            grown = np.zeros((max(2 * self._rows, 16), len(self.questions)), dtype="uint8")
+            grown[:self._rows] = self._answered[:self._rows]
+            self._answered = grown
+        self._answered[self._rows] = vec
+        self._rows += 1
+        self.counts += vec
+        self.cooc += np.outer(vec, vec)
+        for q, v in fields.items():
+            key = self.value_keys.get((q, v.lower()))
+            if key is not None:
+                self.value_counts[key] += 1
+                self.value_cooc[key] += vec
+
+    def suggest(self, user_profile: dict, exclude: Iterable[str], limit: int) -> List[str]:
+        """Unanswered questions ranked by mean conditional answer probability"""
+        rows = []
+        for q, v in user_profile.items():
+            key = self.value_keys.get((q, str(v).lower()))
+            if key is not None and self.value_counts[key] > 0:
+                rows.append(self.value_cooc[key] / self.value_counts[key])
+            elif q in self.position and self.counts[self.position[q]] > 0:
+                i = self.position[q]
+                rows.append(self.cooc[i] / self.counts[i])
+
+        # Fall back to overall answer frequency when nothing answered is known
+        total = max(float(self.counts.max()), 1.0) if len(self.counts) else 1.0
+        scores = np.mean(rows, axis=0) if rows else self.counts / total
+
+        return self._rank(scores, set(user_profile) | set(exclude), limit)
+
+    def tally(self, record_ids: np.ndarray, blocked: Iterable[str], limit: int) -> List[str]:
+        """Unanswered questions ranked by how many of the given records answered them"""
+        record_ids = record_ids[(record_ids >= 0) & (record_ids < len(self.answered))]
+        scores = self.answered[record_ids].sum(axis=0, dtype="float32")
+        return self._rank(scores, set(blocked), limit)
+
+    def _rank(self, scores: np.ndarray, blocked: set, limit: int) -> List[str]:
+        candidates = [i for i, q in enumerate(self.questions) if q not in blocked and scores[i] > 0]
+        # Stable sort keeps CSV column order among equal scores
+        candidates.sort(key=lambda i: -scores[i])
+        return [self.questions[i] for i in candidates[:limit]]
+
+    # Persistence
+    def save(self, path: str, fingerprint: str):
+        keys = list(self.value_keys.keys())
+        np.savez(
+            path,
+            fingerprint=np.array(fingerprint),
+            questions=np.array(self.questions, dtype=object),
+            answered=self.answered,
+            counts=self.counts,
+            cooc=self.cooc,
+            value_questions=np.array([q for q, _ in keys], dtype=object),
+            value_values=np.array([v for _, v in keys], dtype=object),
+            value_counts=self.value_counts,
+            value_cooc=self.value_cooc
+        )
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> Optional["QuestionCooccurrence"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            data = np.load(path, allow_pickle=True)
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            model = cls(list(data["questions"]))
+            model.answered = data["answered"]
+            model.counts = data["counts"]
+            model.cooc = data["cooc"]
+            model.value_keys = {
+                (q, v): i for i, (q, v) in enumerate(zip(data["value_questions"], data["value_values"]))
+            }
+            model.value_counts = data["value_counts"]
+            model.value_cooc = data["value_cooc"]
+            return model
+        except Exception as e:
+            logger.warning(f"Saved question model unusable, rebuilding: {str(e)}")
+            return None
@@ -0,0 +1,107 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Per-document answer cache matched by query-embedding cosine similarity.
+
+    Query embeddings are expected to be L2-normalized, so a dot product is the
+    cosine similarity. At most ``max_entries`` answers are kept across all
+    documents, evicting the least recently used; entries older than ``ttl``
+    seconds are purged on every lookup and store.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lookups = 0
+        self.hits = 0
+        self.saved_llm_seconds = 0.0
+        self._docs: Dict[int, "OrderedDict[int, dict]"] = {}
+        self._matrices: Dict[int, tuple] = {}  # doc_id -> (entry ids, stacked embeddings)
+        self._lru: "OrderedDict[int, int]" = OrderedDict()  # entry id -> doc_id, least recently used first
+        self._by_age: "OrderedDict[int, int]" = OrderedDict()  # entry id -> doc_id, oldest first
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, eid: int, doc_id: int):
+        entries = self._docs[doc_id]
+        del entries[eid]
+        if not entries:
+            del self._docs[doc_id]
+        self._lru.pop(eid, None)
+        self._by_age.pop(eid, None)
+        self._matrices.pop(doc_id, None)
+
+    def _expire(self):
+        """Drop entries past their TTL, whichever document they belong to"""
+        cutoff = time.monotonic() - self.ttl
+        while self._by_age:
+            eid, doc_id = next(iter(self._by_age.items()))
+            if self._docs[doc_id][eid]["created"] >= cutoff:
+                break
+            self._drop(eid, doc_id)
+
+    def _matrix(self, doc_id: int, entries: "OrderedDict[int, dict]"):
+        if doc_id not in self._matrices:
+            ids = list(entries.keys())
+            self._matrices[doc_id] = (ids, np.vstack([entries[eid]["embedding"] for eid in ids]))
+        return self._matrices[doc_id]
+
+    def lookup(self, doc_id: int, query_embedding) -> Optional[dict]:
+        """Best cached entry above the similarity threshold, if any"""
+        with self._lock:
+            self.lookups += 1
+            self._expire()
+            entries = self._docs.get(doc_id)
+            if not entries:
+                return None
+
+            ids, matrix = self._matrix(doc_id, entries)
+            scores = matrix @ np.asarray(query_embedding, dtype="float32")
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            entry = entries[ids[best]]
+            self._lru.move_to_end(ids[best])
+            self.hits += 1
+            self.saved_llm_seconds += entry["llm_latency"]
+            return {**entry, "similarity": float(scores[best])}
+
+    def store(self, doc_id: int, query: str, query_embedding, answer: str, llm_latency: float):
+        with self._lock:
+            self._expire()
+            entries = self._docs.setdefault(doc_id, OrderedDict())
+            entries[self._next_id] = {
+                "query": query,
+                "embedding": np.asarray(query_embedding, dtype="float32"),
+                "answer": answer,
+                "llm_latency": llm_latency,
+                "created": time.monotonic()
+            }
+            self._lru[self._next_id] = doc_id
+            self._by_age[self._next_id] = doc_id
+            self._next_id += 1
+            self._matrices.pop(doc_id, None)
+            while len(self._lru) > self.max_entries:
+                eid, lru_doc_id = next(iter(self._lru.items()))
+                self._drop(eid, lru_doc_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "saved_llm_seconds": self.saved_llm_seconds,
+                "entries": len(self._lru),
+                "documents": len(self._docs),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold
+            }
@@ -0,0 +1,271 @@
+import os
+import uuid
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from dateutil.rrule import rrulestr
+from dateutil.tz import gettz, tzlocal
+from icalendar import Calendar, Event
+
+from app.utils.storage import CALENDAR_PATH, append_calendar_event, load_calendar
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; bookings are then only serialized within one worker process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Working hours used by free-slot search (local time, 24h clock)
+WORKDAY_START = int(os.getenv("SCHEDULE_WORKDAY_START", "9"))
+WORKDAY_END = int(os.getenv("SCHEDULE_WORKDAY_END", "17"))
+FREE_SLOT_HORIZON_DAYS = int(os.getenv("SCHEDULE_FREE_SLOT_HORIZON_DAYS", "30"))
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def to_utc(value) -> datetime:
+    """Aware UTC datetime from an ics/parsed value; naive times and dates are local"""
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.astimezone()).astimezone(timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min).astimezone().astimezone(timezone.utc)
+    raise TypeError(f"Not a date or datetime: {value!r}")
+
+
+def _zoned(value) -> datetime:
+    """Aware datetime in the value's own zone, for expanding recurrences in wall-clock time"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=tzlocal())
+        zone = getattr(value.tzinfo, "zone", None)  # pytz zones keep one fixed offset under rrule arithmetic
+        return value.replace(tzinfo=gettz(zone)) if zone else value
+    return datetime.combine(value, time.min, tzinfo=tzlocal())
+
+
+def _calendar_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(CALENDAR_PATH)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+@contextmanager
+def _calendar_file_lock(shared: bool = False):
+    """Lock on the calendar across worker processes: exclusive to write, shared to read.
+
+    Always taken before ``CalendarIndex._lock``, so a thread waiting on another
+    process never holds up readers of this process's index.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(CALENDAR_PATH) or ".", exist_ok=True)
+    with open(f"{CALENDAR_PATH}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CalendarIndex:
+    """In-memory interval index over the events of one calendar.
+
+    One-off events live in a list sorted by start time. Since no event is
+    longer than ``max_duration``, every event overlapping ``[start, end)``
+    starts within ``[start - max_duration, end)``, so a conflict check is a
+    binary search plus the handful of events in that window. Recurring events
+    are kept as rules in their own time zone and only expanded for the window
+    being queried, so they keep their local time across DST changes.
+
+    Each worker process holds its own index. ``book`` takes a file lock and
+    reloads the index if another process wrote to the calendar since, so the
+    conflict check and the append are atomic across workers; ``free_slots``
+    reloads the same way before searching. Both block on the file lock, so
+    call them off the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._starts: List[datetime] = []
+        self._events: List[dict] = []  # parallel to _starts
+        self._series: List[dict] = []
+        self.max_duration = timedelta(0)
+        self._stamp: Optional[Tuple[int, int]] = None  # calendar file size and mtime as last seen
+
+    @classmethod
+    def from_calendar(cls, cal: Calendar) -> "CalendarIndex":
+        index = cls()
+        for component in cal.walk("VEVENT"):
+            try:
+                index.add_component(component)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable calendar event {component.get('uid')}: {str(e)}")
+        return index
+
+    def reload(self):
+        """Replace the indexed events with the stored calendar's"""
+        stamp = _calendar_stamp()
+        loaded = CalendarIndex.from_calendar(load_calendar())
+        with self._lock:
+            self._starts, self._events, self._series = loaded._starts, loaded._events, loaded._series
+            self.max_duration = loaded.max_duration
+            self._stamp = stamp
+
+    def refresh(self):
+        """Reload if another worker has written to the calendar since we last looked"""
+        if _calendar_stamp() == self._stamp:
+            return
+        with _calendar_file_lock(shared=True):  # never parse a half-appended file
+            if _calendar_stamp() != self._stamp:
+                self.reload()
+
+    def add_component(self, component):
+        start = to_utc(component.decoded("dtstart"))
+        if component.get("dtend") is not None:
+            end = to_utc(component.decoded("dtend"))
+        elif component.get("duration") is not None:
+            end = start + component.decoded("duration")
+        else:
+            # RFC 5545: all-day events without an end last one day, timed ones are instants
+            is_date = not isinstance(component.decoded("dtstart"), datetime)
+            end = start + (timedelta(days=1) if is_date else timedelta(0))
+
+        event = {
+            "uid": str(component.get("uid", "")),
+            "summary": str(component.get("summary", "")),
+            "start": start,
+            "end": end
+        }
+        rule = component.get("rrule")
+        if rule is not None:
+            exdates = component.get("exdate") or []
+            if not isinstance(exdates, list):
+                exdates = [exdates]
+            # Expand from the zoned DTSTART: a weekly 9:00 meeting stays at 9:00 local after a DST change
+            dtstart = _zoned(component.decoded("dtstart"))
+            event["rule"] = rrulestr(f"RRULE:{rule.to_ical().decode()}", dtstart=dtstart, forceset=True)
+            for exdate in exdates:
+                for dt in exdate.dts:
+                    event["rule"].exdate(to_utc(dt.dt))
+            with self._lock:
+                self._series.append(event)
+                self.max_duration = max(self.max_duration, end - start)
+        else:
+            self.add(event)
+
+    def add(self, event: dict):
+        with self._lock:
+            pos = bisect.bisect_right(self._starts, event["start"])
+            self._starts.insert(pos, event["start"])
+            self._events.insert(pos, event)
+            self.max_duration = max(self.max_duration, event["end"] - event["start"])
+
+    def __len__(self) -> int:
+        return len(self._events) + len(self._series)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[dict]:
+        """Events (recurrences expanded) intersecting ``[start, end)``, by start time"""
+        start, end = to_utc(start), to_utc(end)
+        with self._lock:
+            lo = bisect.bisect_left(self._starts, start - self.max_duration)
+            hi = bisect.bisect_left(self._starts, end)
+            found = [e for e in self._events[lo:hi] if _overlaps(e, start, end)]
+            found.extend(self._expand(start, end))
+        found.sort(key=lambda e: e["start"])
+        return found
+
+    def _expand(self, start: datetime, end: datetime) -> Iterator[dict]:
+        for series in self._series:
+            duration = series["end"] - series["start"]
+            for occurrence in series["rule"].between(start - duration, end, inc=True):
+                occurrence = occurrence.astimezone(timezone.utc)
+                event = {**series, "start": occurrence, "end": occurrence + duration}
+                del event["rule"]
+                if _overlaps(event, start, end):
+                    yield event
+
+    def free_slots(self, duration: timedelta, after: datetime, limit: int = 5,
+                   until: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+        """Earliest gaps of at least ``duration`` inside working hours"""
+        self.refresh()
+        # Offer slots on quarter-hour boundaries
+        after = to_utc(after)
+        after += timedelta(minutes=-after.minute % 15, seconds=-after.second, microseconds=-after.microsecond)
+        until = to_utc(until) if until else after + timedelta(days=FREE_SLOT_HORIZON_DAYS)
+        slots = []
+        for day_start, day_end in _working_windows(after, until):
+            cursor = day_start
+            for event in self.overlapping(day_start, day_end):
+                if event["start"] - cursor >= duration:
+                    slots.append((cursor, cursor + duration))
+                    if len(slots) >= limit:
+                        return slots
+                cursor = max(cursor, event["end"])
+            if day_end - cursor >= duration:
+                slots.append((cursor, cursor + duration))
+                if len(slots) >= limit:
+                    return slots
+        return slots
+
+    def book(self, start: datetime, end: datetime, summary: str,
+             description: Optional[str] = None) -> Tuple[Optional[Event], List[dict]]:
+        """Add and persist an event unless it conflicts; returns (event, []) or (None, conflicts)"""
+        start, end = to_utc(start), to_utc(end)
+        with _calendar_file_lock(), self._lock:
+            if _calendar_stamp() != self._stamp:
+                self.reload()  # another worker booked since we last looked
+            conflicts = self.overlapping(start, end)
+            if conflicts:
+                return None, conflicts
+            component = Event()
+            component.add("uid", f"{uuid.uuid4()}@powernest")
+            component.add("dtstamp", datetime.now(timezone.utc))
+            component.add("dtstart", start)
+            component.add("dtend", end)
+            component.add("summary", summary)
+            if description:
+                component.add("description", description)
+            append_calendar_event(component)
+            self.add({"uid": str(component["uid"]), "summary": summary, "start": start, "end": end})
+            self._stamp = _calendar_stamp()
+        return component, []
+
+
+def _overlaps(event: dict, start: datetime, end: datetime) -> bool:
+    if event["start"] == event["end"]:
+        return start <= event["start"] < end
+    return event["start"] < end and event["end"] > start
+
+
+def _working_windows(after: datetime, until: datetime) -> Iterator[Tuple[datetime, datetime]]:
+    """Local working-hour windows on weekdays between ``after`` and ``until``, in UTC"""
+    day = after.astimezone().date()
+    while True:
+        local_start = datetime.combine(day, time(WORKDAY_START)).astimezone()
+        if local_start.astimezone(timezone.utc) >= until:
+            return
+        if day.weekday() < 5:
+            start = max(local_start.astimezone(timezone.utc), after)
+            end = min(datetime.combine(day, time(WORKDAY_END)).astimezone().astimezone(timezone.utc), until)
+            if end > start:
+                yield start, end
+        day += timedelta(days=1)
+
+
+def get_calendar_index() -> CalendarIndex:
+    """Singleton index, parsed from the stored .ics once per process"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CalendarIndex()
+            _index.reload()
+            logger.info(f"Calendar index loaded with {len(_index)} events")
+    return _index
@@ -0,0 +1,115 @@
+import os
+import io
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_CACHE_DOCS = int(os.getenv("RAG_CHUNK_CACHE_DOCS", "64"))
+
+
+class DocumentChunks:
+    """One document's chunk texts as a single UTF-8 buffer plus offsets.
+
+    Avoids a str, a dict and a metadata dict per chunk; a text is decoded
+    only when it is read.
+    """
+
+    __slots__ = ("data", "offsets", "pages")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, pages: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.pages = pages
+
+    @classmethod
+    def from_chunks(cls, chunks: List[dict]) -> "DocumentChunks":
+        encoded = [chunk["text"].encode("utf-8") for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype="int64")
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        pages = np.array([
+            -1 if chunk.get("metadata", {}).get("page") is None else chunk["metadata"]["page"]
+            for chunk in chunks
+        ], dtype="int32")
+        return cls(np.frombuffer(b"".join(encoded), dtype="uint8"), offsets, pages)
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def text(self, chunk_no: int) -> str:
+        return self.data[self.offsets[chunk_no]:self.offsets[chunk_no + 1]].tobytes().decode("utf-8")
+
+    def page(self, chunk_no: int) -> Optional[int]:
+        page = int(self.pages[chunk_no])
+        return None if page < 0 else page
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes + self.pages.nbytes
+
+
+class ChunkStore:
+    """Chunk texts per document on disk, with a bounded LRU of loaded documents"""
+
+    def __init__(self, directory: str, max_docs: int = CHUNK_CACHE_DOCS):
+        self.directory = directory
+        self.max_docs = max_docs
+        self._docs: "OrderedDict[int, DocumentChunks]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, doc_id: int, ext: str = "npz") -> str:
+        return os.path.join(self.directory, f"{doc_id}.{ext}")
+
+    def put(self, doc_id: int, chunks: List[dict]) -> DocumentChunks:
+        doc_chunks = DocumentChunks.from_chunks(chunks)
+        buffer = io.BytesIO()
+        np.savez(buffer, data=doc_chunks.data, offsets=doc_chunks.offsets, pages=doc_chunks.pages)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(doc_id)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, self._path(doc_id))
+        self._remember(doc_id, doc_chunks)
+        return doc_chunks
+
+    def get(self, doc_id: int) -> DocumentChunks:
+        with self._lock:
+            doc_chunks = self._docs.get(doc_id)
+            if doc_chunks is not None:
+                self._docs.move_to_end(doc_id)
+                return doc_chunks
+        doc_chunks = self._read(doc_id)
+        self._remember(doc_id, doc_chunks)
+        return doc_chunks
+
+    def texts(self, doc_id: int, chunk_nos: Sequence[int]) -> List[str]:
+        doc_chunks = self.get(doc_id)
+        return [doc_chunks.text(chunk_no) for chunk_no in chunk_nos]
+
+    def _read(self, doc_id: int) -> DocumentChunks:
+        if os.path.exists(self._path(doc_id)):
+            with np.load(self._path(doc_id)) as saved:
+                return DocumentChunks(saved["data"], saved["offsets"], saved["pages"])
+        # Documents ingested before the compact format
+        with open(self._path(doc_id, "json"), "r") as f:
+            return DocumentChunks.from_chunks(json.load(f))
+
+    def _remember(self, doc_id: int, doc_chunks: DocumentChunks):
+        with self._lock:
+            self._docs[doc_id] = doc_chunks
+            self._docs.move_to_end(doc_id)
+            while len(self._docs) > self.max_docs:
+                self._docs.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded_docs": len(self._docs),
+                "loaded_bytes": sum(doc_chunks.nbytes for doc_chunks in self._docs.values()),
+                "max_docs": self.max_docs
+            }
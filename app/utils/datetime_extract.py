@@ -0,0 +1,159 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import List, Optional
+
+from dateparser.search import search_dates
+
+# Kept free of spaCy and model imports: this module is what parse worker processes load
+
+DATETIME_CACHE_SIZE = int(os.getenv("SCHEDULE_DATETIME_CACHE_SIZE", "4096"))
+
+PREPROCESS_REPLACEMENTS = [
+    (re.compile(r'\bnoon\b', re.IGNORECASE), '12:00 PM'),
+    (re.compile(r'\bmidnight\b', re.IGNORECASE), '00:00'),
+    (re.compile(r'\bmorning\b', re.IGNORECASE), '9:00 AM'),
+    (re.compile(r'\bevening\b', re.IGNORECASE), '6:00 PM'),
+]
+TOMORROW_PATTERN = re.compile(r'\btomorrow\b', re.IGNORECASE)
+
+# Fast path: the shapes below resolve exactly as dateparser resolves them
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+ISO_PATTERN = re.compile(
+    r'\b(?:(?:on|at)\s+)?(\d{4})-(\d{2})-(\d{2})(?:T(\d{2}):(\d{2})(?::(\d{2}))?)?\b', re.IGNORECASE
+)
+WEEKDAY_PATTERN = re.compile(rf'\b(?:(?:on|next|this)\s+)?({"|".join(WEEKDAYS)})\b', re.IGNORECASE)
+# "at 3pm", "at 4:15 pm", "at 15:00"; bare "10am" and "12:xx am" are left to dateparser,
+# which reads some of them as months
+TIME_PATTERN = re.compile(r'(?:\b(at)\s+|(?<=\s))(\d{1,2})(?::(\d{2}))?(?:\s?([ap])m)?\b', re.IGNORECASE)
+# Anything else that dateparser could read as part of a date makes us defer to it
+DATE_WORDS = re.compile(
+    r'\d|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|january|february|march|april|june|'
+    r'july|august|september|october|november|december|mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun|'
+    r'today|tonight|tomorrow|yesterday|now|ago|last|noon|midnight|am|pm|a\.m|p\.m|'
+    r'secs?|seconds?|mins?|minutes?|hrs?|hours?|days?|weeks?|weekend|fortnight|months?|years?|decade|'
+    r'one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|twenty|thirty|half|quarter|'
+    r'utc|gmt|est|edt|cst|cdt|mst|mdt|pst|pdt|ist|cet|cest|bst)\b',
+    re.IGNORECASE
+)
+
+
+def preprocess_text(text: str) -> str:
+    """Normalize text for better parsing"""
+    for pattern, repl in PREPROCESS_REPLACEMENTS:
+        text = pattern.sub(repl, text)
+    return TOMORROW_PATTERN.sub(_tomorrow(date.today()), text)
+
+
+@lru_cache(maxsize=2)
+def _tomorrow(today: date) -> str:
+    return (today + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def extract_datetime(text: str) -> Optional[datetime]:
+    """Rule-based fast path first, dateparser only for what it cannot decide"""
+    now = datetime.now()
+    # Results depend on the current time, so cache entries live for one minute
+    return _extract_cached(" ".join(text.split()), now.replace(second=0, microsecond=0))
+
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _extract_cached(text: str, minute: datetime) -> Optional[datetime]:
+    dt = fast_extract_datetime(text, minute.date())
+    return dt if dt is not None else search_datetime(text)
+
+
+def fast_extract_datetime(text: str, today: date) -> Optional[datetime]:
+    """Resolve ISO dates, weekdays and clock times; None means "ask dateparser" """
+    spans = []
+    isos = list(ISO_PATTERN.finditer(text))
+    weekdays = list(WEEKDAY_PATTERN.finditer(text))
+    if len(isos) + len(weekdays) > 1:
+        return None
+
+    hour = minute = second = 0
+    day = today
+    if isos:
+        m = isos[0]
+        spans.append(m.span())
+        try:
+            day = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            return None
+        if m.group(4):
+            hour, minute, second = int(m.group(4)), int(m.group(5)), int(m.group(6) or 0)
+    elif weekdays:
+        m = weekdays[0]
+        spans.append(m.span())
+        # dateparser's default: the same day if it is today, otherwise the latest past one
+        day = today - timedelta(days=(today.weekday() - WEEKDAYS.index(m.group(1).lower())) % 7)
+
+    times = []
+    for m in TIME_PATTERN.finditer(text):
+        if m.group(1) or _follows(text, m.start(), spans):
+            times.append(m)
+    if len(times) > 1 or (times and isos and isos[0].group(4)):
+        return None
+    if times:
+        m = times[0]
+        clock = _clock(m, after_iso=bool(isos) and not m.group(1))
+        if clock is None:
+            return None
+        hour, minute = clock
+        spans.append(m.span())
+    elif not spans:
+        return None
+
+    rest = text
+    for start, end in sorted(spans, reverse=True):
+        rest = rest[:start] + " " + rest[end:]
+    if DATE_WORDS.search(rest):
+        return None
+    return datetime(day.year, day.month, day.day, hour, minute, second).astimezone()
+
+
+def _follows(text: str, pos: int, spans) -> bool:
+    """True if ``pos`` directly follows a matched date (one space in between)"""
+    return any(text[end:pos].isspace() and len(text[end:pos]) == 1 for _, end in spans)
+
+
+def _clock(m, after_iso: bool) -> Optional[tuple]:
+    hour, minute, meridiem = int(m.group(2)), m.group(3), (m.group(4) or "").lower()
+    if meridiem:
+        # Only "H pm", "H:MM pm" and "H:MM am" (H < 12) behave in dateparser, and only after "at"
+        if after_iso or not 1 <= hour <= 12 or (meridiem == "a" and (minute is None or hour == 12)):
+            return None
+        if meridiem == "p" and hour < 12:
+            hour += 12
+    elif minute is None or hour > 23:
+        return None
+    minute = int(minute or 0)
+    return (hour, minute) if minute < 60 else None
+
+
+def search_datetime(text: str) -> Optional[datetime]:
+    """Robust datetime parsing with context awareness"""
+    try:
+        dates = search_dates(
+            text,
+            languages=['en'],
+            settings={
+                'PREFER_DAY_OF_MONTH': 'first',
+                'RELATIVE_BASE': datetime.now(),
+                'RETURN_AS_TIMEZONE_AWARE': True,
+                'PREFER_LOCALE_DATE_ORDER': False
+            }
+        )
+        return dates[0][1] if dates else None
+    except Exception:
+        return None
+
+
+def extract_datetimes_iso(texts: List[str]) -> List[Optional[str]]:
+    """Process-pool entry point: one chunk of commands in, ISO strings out"""
+    results = []
+    for text in texts:
+        dt = extract_datetime(text)
+        results.append(dt.isoformat() if dt else None)
+    return results
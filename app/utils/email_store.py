@@ -0,0 +1,152 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.utils.db import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+EMAIL_DB_PATH = os.getenv("EMAIL_DB_PATH", "data/emails.sqlite3")
+LEGACY_DRAFTS_PATH = "data/emails.json"
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class EmailDraftStore:
+    """Append-only draft table indexed by recipient and timestamp.
+
+    Each save is one INSERT, so write cost stays constant as drafts
+    accumulate; listings page backwards by draft ID.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.conn = connect_sqlite(path)
+        self.conn.row_factory = _row_to_dict
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS drafts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                recipient_key TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS drafts_recipient ON drafts(recipient_key, id);
+            CREATE INDEX IF NOT EXISTS drafts_timestamp ON drafts(timestamp);
+            CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at TEXT NOT NULL);
+        """)
+        self.conn.commit()
+
+    def add(self, recipient: str, subject: str, content: str, timestamp: Optional[str] = None) -> int:
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO drafts (recipient, recipient_key, subject, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (recipient, recipient.strip().lower(), subject, content, timestamp or datetime.now().isoformat())
+            )
+            self.conn.commit()
+        return cursor.lastrowid
+
+    def add_many(self, drafts: List[Dict[str, str]]):
+        """Insert several drafts in one transaction"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO drafts (recipient, recipient_key, subject, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (d["recipient"], d["recipient"].strip().lower(), d["subject"], d["content"],
+                     d.get("timestamp") or now)
+                    for d in drafts
+                ]
+            )
+            self.conn.commit()
+
+    def search(self, recipient: Optional[str] = None, text: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None,
+               before_id: Optional[int] = None, limit: int = 20) -> List[Dict]:
+        """Newest-first drafts matching all given filters, paged by ``before_id``"""
+        clauses, params = [], []
+        if recipient:
+            clauses.append("recipient_key = ?")
+            params.append(recipient.strip().lower())
+        if text:
+            clauses.append("(subject LIKE ? OR content LIKE ?)")
+            params.extend([f"%{text}%"] * 2)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT id, recipient, subject, content, timestamp FROM drafts {where} ORDER BY id DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+
+    def all(self) -> List[Dict]:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, recipient, subject, content, timestamp FROM drafts ORDER BY id"
+            ).fetchall()
+
+    def migrate_json(self, path: str):
+        """One-time import of the legacy rewrite-whole-file emails.json"""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                content = f.read().strip()
+            legacy = json.loads(content) if content else []
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON in {path}, skipping draft migration")
+            return
+
+        now = datetime.now().isoformat()
+        with self._lock:
+            # One transaction, so concurrent workers cannot both import the file
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self.conn.execute("SELECT 1 FROM migrations WHERE name = 'emails_json'").fetchone()
+                if not done:
+                    self.conn.executemany(
+                        "INSERT INTO drafts (recipient, recipient_key, subject, content, timestamp) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (d.get("recipient", ""), d.get("recipient", "").strip().lower(),
+                             d.get("subject", ""), d.get("content", ""), d.get("timestamp") or now)
+                            for d in legacy
+                        ]
+                    )
+                    self.conn.execute(
+                        "INSERT INTO migrations (name, applied_at) VALUES ('emails_json', ?)", (now,)
+                    )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        if not done:
+            os.replace(path, f"{path}.migrated")
+            logger.info(f"Migrated {len(legacy)} email drafts from {path}")
+
+
+def _row_to_dict(cursor, row) -> Dict:
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+def get_email_store() -> EmailDraftStore:
+    """Singleton draft store, importing the legacy JSON file on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmailDraftStore(EMAIL_DB_PATH)
+            _store.migrate_json(LEGACY_DRAFTS_PATH)
+    return _store
@@ -0,0 +1,118 @@
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from app.utils.metrics import registry, stage
+
+logger = logging.getLogger(__name__)
+
+JOBS = registry.counter("powernest_jobs_total", "Background jobs finished", ("kind", "status"))
+
+
+class Job:
+    """Progress record for one background job"""
+
+    def __init__(self, kind: str, **info):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.status = "queued"
+        self.progress: Dict = {}
+        self.result: Dict = {}
+        self.error: Optional[str] = None
+        self.info = info
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+        self._on_cancel: Optional[Callable[["Job"], None]] = None
+
+    def update(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+            self.updated_at = datetime.now()
+
+    def _set_status(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.updated_at = datetime.now()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                **self.info,
+                "progress": dict(self.progress),
+                "result": dict(self.result),
+                "error": self.error,
+                "created_at": self.created_at.isoformat(),
+                "updated_at": self.updated_at.isoformat()
+            }
+
+
+class JobQueue:
+    """Runs jobs on a bounded worker pool and keeps their status for polling"""
+
+    def __init__(self, max_workers: int = 2, max_finished: int = 500):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[Job], Optional[dict]],
+               on_cancel: Optional[Callable[[Job], None]] = None, **info) -> Job:
+        """Queue ``fn(job)``; its returned dict becomes the job result.
+
+        ``on_cancel(job)`` runs instead if the job is dropped from the queue at
+        shutdown before it started, e.g. to delete its input files.
+        """
+        job = Job(kind, **info)
+        job._on_cancel = on_cancel
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        job._future = self.executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def shutdown(self):
+        """Cancel queued jobs and wait for running ones to finish"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            if job._future is None or not job._future.cancel():
+                continue  # running or done
+            job._set_status("cancelled")
+            JOBS.inc(kind=job.kind, status=job.status)
+            if job._on_cancel is not None:
+                try:
+                    job._on_cancel(job)
+                except Exception as e:
+                    logger.error(f"Cleanup of cancelled job {job.id} ({job.kind}) failed: {str(e)}")
+        self.executor.shutdown(wait=True)
+
+    def _run(self, job: Job, fn: Callable[[Job], Optional[dict]]):
+        job._set_status("running")
+        try:
+            with stage(f"job.{job.kind}"):
+                job.result = fn(job) or {}
+            job._set_status("completed")
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job._set_status("failed", str(e))
+        JOBS.inc(kind=job.kind, status=job.status)
+
+    def _prune(self):
+        """Forget the oldest finished jobs once over the retention limit"""
+        finished = [jid for jid, j in self.jobs.items() if j.status in ("completed", "failed", "cancelled")]
+        for jid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[jid]
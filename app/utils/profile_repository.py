@@ -0,0 +1,198 @@
+import os
+import json
+import atexit
+import logging
+import threading
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from app.utils.db import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PROFILE_DB_PATH = os.getenv("PROFILE_DB_PATH", "data/profiles.sqlite3")
+PROFILE_FLUSH_INTERVAL = float(os.getenv("PROFILE_FLUSH_INTERVAL", "2.0"))  # seconds between fsynced flushes
+LEGACY_PROFILES_DIR = "data/profiles"
+INDEXED_FIELDS = ("name", "email", "startup_name")
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+class ProfileRepository:
+    """SQLite-backed profile store with write-behind batching.
+
+    ``save`` only records the latest profile per session in memory; a flusher
+    thread writes everything pending in one transaction (one fsync) every
+    ``flush_interval`` seconds, so rapid successive answers coalesce into a
+    single write. Reads see pending writes first.
+    """
+
+    def __init__(self, path: str, flush_interval: float = PROFILE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, dict] = {}
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps flushes in order so older data never lands last
+        self._stop = threading.Event()
+
+        self.conn = connect_sqlite(path)
+        self.conn.execute("PRAGMA synchronous=FULL")  # flushes are rare, make each one durable
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS profiles (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                {", ".join(f"{field} TEXT" for field in INDEXED_FIELDS)},
+                updated_at TEXT NOT NULL
+            );
+            {"".join(f"CREATE INDEX IF NOT EXISTS profiles_{field} ON profiles({field});" for field in INDEXED_FIELDS)}
+            CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at TEXT NOT NULL);
+        """)
+        self.conn.commit()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="profile-flusher", daemon=True)
+        self._flusher.start()
+
+    # Writes
+    def save(self, session_id: str, profile: dict):
+        with self._pending_lock:
+            self._pending[session_id] = dict(profile)
+
+    def flush(self):
+        """Write all pending profiles in a single transaction"""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            if pending:
+                self._write(pending)
+
+    def _write(self, profiles: Dict[str, dict], replace: bool = True):
+        now = datetime.now().isoformat()
+        try:
+            with self._db_lock:
+                self.conn.executemany(
+                    f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO profiles (session_id, data, {', '.join(INDEXED_FIELDS)}, updated_at) "
+                    f"VALUES ({', '.join('?' * (len(INDEXED_FIELDS) + 3))})",
+                    [
+                        (sid, json.dumps(profile), *(_field_key(profile.get(f)) for f in INDEXED_FIELDS), now)
+                        for sid, profile in profiles.items()
+                    ]
+                )
+                self.conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to flush {len(profiles)} profiles: {str(e)}")
+            # Keep them for the next flush unless newer versions arrived meanwhile
+            with self._pending_lock:
+                for sid, profile in profiles.items():
+                    self._pending.setdefault(sid, profile)
+            raise
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # already logged; retried next interval
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    # Reads
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._pending_lock:
+            if session_id in self._pending:
+                return dict(self._pending[session_id])
+        with self._db_lock:
+            row = self.conn.execute("SELECT data FROM profiles WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by(self, field: str, value: str) -> Dict[str, dict]:
+        """Profiles whose indexed ``field`` matches ``value`` (case-insensitive)"""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Profiles are not indexed by {field}")
+        self.flush()
+        with self._db_lock:
+            rows = self.conn.execute(
+                f"SELECT session_id, data FROM profiles WHERE {field} = ?", (_field_key(value),)
+            ).fetchall()
+        return {sid: json.loads(data) for sid, data in rows}
+
+    def session_ids(self) -> List[str]:
+        with self._db_lock:
+            stored = [sid for (sid,) in self.conn.execute("SELECT session_id FROM profiles")]
+        known = set(stored)
+        with self._pending_lock:
+            pending = [sid for sid in self._pending if sid not in known]
+        return stored + pending
+
+    def migrate_json_dir(self, directory: str):
+        """One-time import of the legacy one-JSON-file-per-session profiles"""
+        if not os.path.isdir(directory):
+            return
+        with self._db_lock:
+            if self.conn.execute("SELECT 1 FROM migrations WHERE name = 'profiles_json'").fetchone():
+                return
+        profiles = {}
+        for file in os.listdir(directory):
+            if file.endswith(".json"):
+                try:
+                    with open(os.path.join(directory, file), "r") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    logger.warning(f"Skipping unreadable profile {file}")
+                    continue
+                if data:
+                    profiles[file.split(".")[0]] = data
+        # Never overwrite a newer stored version; mark done only once imported
+        if profiles:
+            self._write(profiles, replace=False)
+        with self._db_lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO migrations (name, applied_at) VALUES ('profiles_json', ?)",
+                (datetime.now().isoformat(),)
+            )
+            self.conn.commit()
+        logger.info(f"Migrated {len(profiles)} profiles from {directory}")
+
+
+class LazyProfiles(Mapping):
+    """Read-only session_id -> profile mapping that loads each profile on access"""
+
+    def __init__(self, repository: ProfileRepository):
+        self.repository = repository
+        self._ids = None
+
+    def _session_ids(self) -> List[str]:
+        if self._ids is None:
+            self._ids = self.repository.session_ids()
+        return self._ids
+
+    def __getitem__(self, session_id: str) -> dict:
+        profile = self.repository.get(session_id)
+        if profile is None:
+            raise KeyError(session_id)
+        return profile
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._session_ids())
+
+    def __len__(self) -> int:
+        return len(self._session_ids())
+
+
+def _field_key(value) -> Optional[str]:
+    return str(value).strip().lower() if value is not None else None
+
+
+def get_profile_repository() -> ProfileRepository:
+    """Singleton profile repository, importing legacy JSON profiles on first use"""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = ProfileRepository(PROFILE_DB_PATH)
+            _repository.migrate_json_dir(LEGACY_PROFILES_DIR)
+            atexit.register(_repository.close)
+    return _repository
@@ -0,0 +1,218 @@
+import os
+import time
+import heapq
+import pickle
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.db import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # "memory" or "sqlite"
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.sqlite3")
+SESSION_MEMORY_CAP = int(os.getenv("SESSION_MEMORY_CAP", "10000"))
+
+_stores: Dict[str, "SessionStore"] = {}
+
+
+class SessionStore(ABC):
+    """Key-value store for session state with a sliding TTL.
+
+    ``get`` returns the stored session; callers persist changes with ``set``,
+    which also refreshes the session's expiry.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, session: dict):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def expire(self) -> int:
+        """Remove expired sessions, returning how many were dropped"""
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions pickled into a WAL-mode SQLite table shared by every worker process"""
+
+    def __init__(self, path: str, namespace: str, ttl: float):
+        super().__init__(ttl)
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.conn = connect_sqlite(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "namespace TEXT NOT NULL, session_id TEXT NOT NULL, data BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, PRIMARY KEY (namespace, session_id))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions(namespace, expires_at)")
+        self.conn.commit()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data FROM sessions WHERE namespace = ? AND session_id = ? AND expires_at > ?",
+                (self.namespace, session_id, time.time())
+            ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, session_id: str, session: dict, expires_at: Optional[float] = None):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, session_id, data, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, session_id, pickle.dumps(session), expires_at or time.time() + self.ttl)
+            )
+            self.conn.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM sessions WHERE namespace = ? AND session_id = ?",
+                (self.namespace, session_id)
+            )
+            self.conn.commit()
+
+    def expire(self) -> int:
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM sessions WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time())
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT session_id, data FROM sessions WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time())
+            ).fetchall()
+        for session_id, data in rows:
+            yield session_id, pickle.loads(data)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self.conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time())
+            ).fetchone()
+        return count
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process LRU session dict with a heap-based expiry index.
+
+    When more than ``max_entries`` sessions are held, the least recently used
+    ones are moved to ``spill`` (if given) and brought back on their next access.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = SESSION_MEMORY_CAP,
+                 spill: Optional[SQLiteSessionStore] = None):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.spill = spill
+        self._sessions: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._expiry: List[Tuple[float, str]] = []
+
+    def get(self, session_id: str) -> Optional[dict]:
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            session, expires_at = entry
+            if expires_at > time.time():
+                self._sessions.move_to_end(session_id)
+                return session
+            del self._sessions[session_id]
+            return None
+
+        if self.spill is not None:
+            session = self.spill.get(session_id)
+            if session is not None:
+                self.spill.delete(session_id)
+                self.set(session_id, session)
+                return session
+        return None
+
+    def set(self, session_id: str, session: dict):
+        expires_at = time.time() + self.ttl
+        self._sessions[session_id] = (session, expires_at)
+        self._sessions.move_to_end(session_id)
+        heapq.heappush(self._expiry, (expires_at, session_id))
+
+        while len(self._sessions) > self.max_entries:
+            lru_id, (lru_session, lru_expires) = self._sessions.popitem(last=False)
+            if self.spill is not None:
+                self.spill.set(lru_id, lru_session, expires_at=lru_expires)
+
+        # Every refresh leaves a stale heap entry behind; rebuild once they outnumber live ones
+        if len(self._expiry) > 2 * len(self._sessions) + 64:
+            self._expiry = [(expires_at, sid) for sid, (_, expires_at) in self._sessions.items()]
+            heapq.heapify(self._expiry)
+
+    def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self.spill is not None:
+            self.spill.delete(session_id)
+
+    def expire(self) -> int:
+        now = time.time()
+        dropped = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry)
+            entry = self._sessions.get(session_id)
+            # Stale heap entries (session refreshed since) are simply discarded
+            if entry is not None and entry[1] == expires_at:
+                del self._sessions[session_id]
+                dropped += 1
+        if self.spill is not None:
+            dropped += self.spill.expire()
+        return dropped
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        now = time.time()
+        for session_id, (session, expires_at) in list(self._sessions.items()):
+            if expires_at > now:
+                yield session_id, session
+        if self.spill is not None:
+            yield from self.spill.items()
+
+    def __len__(self) -> int:
+        return len(self._sessions) + (len(self.spill) if self.spill is not None else 0)
+
+
+def get_session_store(namespace: str, ttl: float) -> SessionStore:
+    """Session store for one agent, backed by SESSION_STORE ("memory" or "sqlite")"""
+    if namespace not in _stores:
+        if SESSION_STORE == "sqlite":
+            _stores[namespace] = SQLiteSessionStore(SESSION_DB_PATH, namespace, ttl)
+        else:
+            _stores[namespace] = InMemorySessionStore(
+                ttl,
+                spill=SQLiteSessionStore(SESSION_DB_PATH, f"{namespace}:spill", ttl)
+            )
+    return _stores[namespace]
@@ -1,9 +1,11 @@
 import os
 import json
-import pandas as pd
-from icalendar import Calendar
+from datetime import datetime
+from icalendar import Calendar, Event
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Mapping
+from app.utils.email_store import get_email_store
+from app.utils.profile_repository import LazyProfiles, get_profile_repository
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +31,10 @@ def _safe_json_load(filepath: str, default: Any = None):
         logger.error(f"Error reading {filepath}: {str(e)}")
         return default if default is not None else []
 
-# Profile storage
+# Profile storage (write-behind SQLite repository, see profile_repository.py)
 def save_profile(session_id: str, profile: dict):
     try:
-        path = "data/profiles"
-        _ensure_directory_exists(path)
-        with open(f"{path}/{session_id}.json", "w") as f:
-            json.dump(profile, f, indent=2)
+        get_profile_repository().save(session_id, profile)
     except Exception as e:
         logger.error(f"Failed to save profile: {str(e)}")
         raise
@@ -50,26 +49,22 @@ def save_conversation(session_id: str, history: list):
         logger.error(f"Failed to save conversation: {str(e)}")
         raise
 
-def load_profiles() -> Dict[str, Any]:
-    profiles = {}
-    path = "data/profiles"
-    try:
-        _ensure_directory_exists(path)
-        for file in os.listdir(path):
-            if file.endswith(".json"):
-                file_path = os.path.join(path, file)
-                profile_data = _safe_json_load(file_path, {})
-                if profile_data:  # Only add if we got valid data
-                    profiles[file.split(".")[0]] = profile_data
-    except Exception as e:
-        logger.error(f"Error loading profiles: {str(e)}")
-    return profiles
+def load_profiles() -> Mapping[str, Any]:
+    """Lazy session_id -> profile mapping; profiles are read on access"""
+    return LazyProfiles(get_profile_repository())
+
+def find_profiles(field: str, value: str) -> Dict[str, Any]:
+    """Profiles by an indexed field (name, email or startup_name)"""
+    return get_profile_repository().find_by(field, value)
 
 # Calendar storage
+CALENDAR_PATH = "data/calendar.ics"
+CALENDAR_END = b"END:VCALENDAR"
+
 def save_calendar(cal: Calendar):
     try:
         _ensure_directory_exists("data")
-        with open("data/calendar.ics", "wb") as f:
+        with open(CALENDAR_PATH, "wb") as f:
             f.write(cal.to_ical())
     except Exception as e:
         logger.error(f"Failed to save calendar: {str(e)}")
@@ -78,29 +73,56 @@ def save_calendar(cal: Calendar):
 def load_calendar() -> Calendar:
     try:
         _ensure_directory_exists("data")
-        if os.path.exists("data/calendar.ics"):
-            with open("data/calendar.ics", "rb") as f:
+        if os.path.exists(CALENDAR_PATH):
+            with open(CALENDAR_PATH, "rb") as f:
                 return Calendar.from_ical(f.read())
     except Exception as e:
         logger.error(f"Error loading calendar: {str(e)}")
     return Calendar()
 
-# Email storage
-def save_email_draft(recipient: str, subject: str, content: str):
+def append_calendar_event(event: Event):
+    """Write one event in place before END:VCALENDAR instead of rewriting the file"""
     try:
         _ensure_directory_exists("data")
-        drafts = load_email_drafts()
-        drafts.append({
-            "recipient": recipient,
-            "subject": subject,
-            "content": content,
-            "timestamp": pd.Timestamp.now().isoformat()
-        })
-        with open("data/emails.json", "w") as f:
-            json.dump(drafts, f, indent=2)
+        if not os.path.exists(CALENDAR_PATH) or os.path.getsize(CALENDAR_PATH) == 0:
+            cal = Calendar()
+            cal.add("prodid", "-//PowerNest AI Agent//EN")
+            cal.add("version", "2.0")
+            cal.add_component(event)
+            save_calendar(cal)
+            return
+        with open(CALENDAR_PATH, "r+b") as f:
+            # The closing line is at the very end; only read the tail to find it
+            f.seek(max(0, os.path.getsize(CALENDAR_PATH) - 256))
+            tail_offset = f.tell()
+            tail = f.read()
+            pos = tail.rfind(CALENDAR_END)
+            if pos < 0:
+                raise ValueError(f"{CALENDAR_PATH} has no END:VCALENDAR line")
+            f.seek(tail_offset + pos)
+            f.write(event.to_ical() + CALENDAR_END + b"\r\n")
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception as e:
+        logger.error(f"Failed to append calendar event: {str(e)}")
+        raise
+
+# Email storage (append-only SQLite store, see email_store.py)
+def save_email_draft(recipient: str, subject: str, content: str) -> int:
+    try:
+        return get_email_store().add(recipient, subject, content, datetime.now().isoformat())
     except Exception as e:
         logger.error(f"Failed to save email draft: {str(e)}")
         raise
 
+def save_email_drafts(drafts: List[Dict[str, str]]):
+    """Save several drafts (recipient, subject, content) in one write"""
+    try:
+        get_email_store().add_many(drafts)
+    except Exception as e:
+        logger.error(f"Failed to save {len(drafts)} email drafts: {str(e)}")
+        raise
+
 def load_email_drafts() -> List[Dict[str, str]]:
-    return _safe_json_load("data/emails.json", [])
\ No newline at end of file
+    return get_email_store().all()
\ No newline at end of file
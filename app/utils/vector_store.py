@@ -0,0 +1,419 @@
+import io
+import os
+import json
+import hashlib
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.utils.chunk_store import ChunkStore, DocumentChunks
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.json"
+CHUNKS_DIR = "chunks"
+HASHES_FILE = "chunk_hashes.npy"
+
+# Compressed index settings (RAG_INDEX_TYPE = flat | sq16 | sq8 | ivfpq)
+INDEX_TYPES = ("flat", "sq16", "sq8", "ivfpq")
+TRAIN_SIZE = int(os.getenv("RAG_INDEX_TRAIN_SIZE", "10000"))
+SQ8_RANGE_MARGIN = float(os.getenv("RAG_SQ8_RANGE_MARGIN", "0.2"))
+PQ_M = int(os.getenv("RAG_PQ_M", "48"))
+IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "256"))
+OPQ_NITER = int(os.getenv("RAG_OPQ_NITER", "25"))
+# Seconds between background saves after uploads; 0 saves synchronously on every upload
+SAVE_INTERVAL = float(os.getenv("RAG_SAVE_INTERVAL", "5.0"))
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write a file via a temp file so readers never see a partial write"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; a waiting writer holds off new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+def chunk_hashes(texts: List[str]) -> np.ndarray:
+    """64-bit content hash per chunk text; 0 is reserved for vectors saved without one"""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        for text in texts
+    ], dtype="uint64")
+
+
+def index_kind(index: faiss.Index) -> str:
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivfpq"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
+
+
+def needs_training(index_type: str) -> bool:
+    return index_type in ("sq8", "ivfpq")
+
+
+def make_index(vectors: np.ndarray, index_type: str = "flat") -> faiss.Index:
+    """Inner-product index over normalized vectors, trained on a sample of ``vectors`` if needed.
+
+    sq16 stores float16 components (2x smaller), sq8 one byte per component
+    (4x) and ivfpq PQ_M bytes per vector behind a coarse quantizer, with an
+    OPQ rotation that spreads variance evenly across the sub-quantizers.
+    """
+    dim = vectors.shape[1]
+    if needs_training(index_type) and len(vectors) > TRAIN_SIZE:
+        vectors = vectors[np.random.default_rng(0).choice(len(vectors), TRAIN_SIZE, replace=False)]
+    if index_type == "sq16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        # Per-component ranges from the training vectors, widened for later documents
+        index.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+        index.sq.rangestat_arg = SQ8_RANGE_MARGIN
+        index.train(vectors)
+    elif index_type == "ivfpq":
+        m = max(d for d in range(1, min(PQ_M, dim) + 1) if dim % d == 0)  # sub-quantizers must divide dim
+        nlist = max(1, min(IVF_NLIST, len(vectors) // 39))
+        index = faiss.index_factory(dim, f"OPQ{m},IVF{nlist},PQ{m}", faiss.METRIC_INNER_PRODUCT)
+        faiss.downcast_VectorTransform(index.chain.at(0)).niter = OPQ_NITER
+        index.train(vectors)
+        faiss.extract_index_ivf(index).make_direct_map()  # keeps reconstruct() available
+    elif index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    else:
+        raise ValueError(f"Unknown RAG index type: {index_type}")
+    return index
+
+
+class DocumentVectorStore:
+    """Single FAISS index holding the chunks of every uploaded document.
+
+    Each document owns a contiguous block of vector IDs, so an ID maps to
+    (doc_id, chunk_no) as ``start + chunk_no`` and a per-document query is a
+    range-filtered search that only scans that document's vectors.
+
+    Compressed index types that need training (sq8, ivfpq) hold vectors in a
+    flat index until TRAIN_SIZE have arrived, then re-encode them once.
+
+    FAISS cannot search an index while it is being added to, so searches take
+    the read side of ``_rw`` and index mutations the write side. Writers are
+    serialized by ``_lock`` and only hold the write side for the add or the
+    swap to a re-encoded index.
+
+    Uploads only mark the store dirty; a flusher thread saves at most once
+    every ``save_interval`` seconds, so a burst of uploads costs one
+    serialization of the index instead of one each.
+    """
+
+    def __init__(self, directory: str, index_type: str = "flat", save_interval: float = SAVE_INTERVAL):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown RAG index type: {index_type}")
+        self.directory = directory
+        self.index_type = index_type
+        self.index: Optional[faiss.Index] = None
+        self.docs: Dict[int, dict] = {}
+        self.next_doc_id = 0
+        self._starts: List[int] = []  # sorted block starts, for locate()
+        self._start_doc_ids: List[int] = []
+        self.chunks = ChunkStore(os.path.join(directory, CHUNKS_DIR))
+        self._hashes = np.zeros(0, dtype="uint64")  # chunk hash per vector ID
+        self._hash_order: Optional[np.ndarray] = None  # argsort of _hashes, built on first lookup
+        self._sorted_hashes: Optional[np.ndarray] = None  # _hashes[_hash_order]
+        self._by_file_hash: Dict[str, int] = {}
+        self._lock = threading.RLock()  # one writer at a time
+        self._rw = ReadWriteLock()  # index and registry: searches vs. mutations
+        self.save_interval = save_interval
+        self._dirty = False
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    # Persistence
+    def load(self):
+        """Load the document registry and read the saved index into memory"""
+        os.makedirs(os.path.join(self.directory, CHUNKS_DIR), exist_ok=True)
+        docs_path = os.path.join(self.directory, DOCS_FILE)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if not (os.path.exists(docs_path) and os.path.exists(index_path)):
+            return
+
+        with self._lock:
+            with open(docs_path, "r") as f:
+                state = json.load(f)
+            index = faiss.read_index(index_path)
+            with self._rw.write():
+                self.index = index
+                self.docs = {int(doc_id): info for doc_id, info in state["docs"].items()}
+                self.next_doc_id = state["next_doc_id"]
+                self._rebuild_locator()
+                self._load_hashes()
+            if self._maybe_compress():
+                self.save()
+        logger.info(f"Loaded {len(self.docs)} documents ({self.index.ntotal} vectors, {index_kind(self.index)})")
+
+    def save(self):
+        """Persist the index and document registry"""
+        with self._lock:
+            if self.index is None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with self._rw.read():
+                index_bytes = faiss.serialize_index(self.index).tobytes()
+                state = json.dumps({
+                    "index_type": index_kind(self.index),
+                    "next_doc_id": self.next_doc_id,
+                    "docs": {str(doc_id): info for doc_id, info in self.docs.items()}
+                })
+                hashes = io.BytesIO()
+                np.save(hashes, self._hashes)
+        _atomic_write(os.path.join(self.directory, INDEX_FILE), index_bytes)
+        _atomic_write(os.path.join(self.directory, HASHES_FILE), hashes.getvalue())
+        _atomic_write(os.path.join(self.directory, DOCS_FILE), state.encode())
+
+    def flush(self):
+        """Save if anything was added since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                self.save()
+            except Exception:
+                self._dirty = True
+                raise
+
+    def _mark_dirty(self):
+        if self.save_interval <= 0 or self._stop.is_set():  # nothing left to flush after close()
+            self.save()
+            return
+        self._dirty = True
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="rag-index-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.save_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Vector store save failed: {str(e)}")  # retried next interval
+
+    def close(self):
+        """Stop the flusher and save anything pending"""
+        self._stop.set()
+        self.flush()
+
+    def _load_hashes(self):
+        """Chunk hashes by vector ID; vectors saved before hashing was added count as unknown"""
+        hashes_path = os.path.join(self.directory, HASHES_FILE)
+        hashes = np.load(hashes_path) if os.path.exists(hashes_path) else np.zeros(0, dtype="uint64")
+        self._hashes = np.concatenate([hashes, np.zeros(max(0, self.index.ntotal - len(hashes)), dtype="uint64")])
+        self._hash_order = self._sorted_hashes = None
+        self._by_file_hash = {info["sha256"]: doc_id for doc_id, info in self.docs.items() if info.get("sha256")}
+
+    def _rebuild_locator(self):
+        ordered = sorted(self.docs.items(), key=lambda item: item[1]["start"])
+        self._starts = [info["start"] for _, info in ordered]
+        self._start_doc_ids = [doc_id for doc_id, _ in ordered]
+
+    # Writes
+    def add_document(self, embeddings: np.ndarray, chunks: List[dict], filename: str = "",
+                     file_hash: Optional[str] = None, hashes: Optional[np.ndarray] = None) -> int:
+        """Add one document's chunk embeddings and texts, returning its doc_id"""
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if len(embeddings) != len(chunks):
+            raise ValueError("Embedding and chunk counts differ")
+        if len(chunks) == 0:
+            raise ValueError("Document produced no chunks")
+        if hashes is None:
+            hashes = chunk_hashes([chunk["text"] for chunk in chunks])
+
+        with self._lock:
+            if self.index is not None and self.index.d != embeddings.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.index.d}"
+                )
+            doc_id = self.next_doc_id
+            self.chunks.put(doc_id, chunks)
+
+            with self._rw.write():
+                if self.index is None:
+                    # Trained types start flat and are compressed by _maybe_compress
+                    self.index = make_index(embeddings, "flat" if needs_training(self.index_type) else self.index_type)
+                start = self.index.ntotal
+                self.index.add(embeddings)
+                self._hashes = np.concatenate([self._hashes, hashes.astype("uint64")])
+                self._hash_order = self._sorted_hashes = None
+
+                self.docs[doc_id] = {
+                    "start": start,
+                    "count": len(chunks),
+                    "filename": filename,
+                    "sha256": file_hash,
+                    "created_at": datetime.now().isoformat()
+                }
+                if file_hash:
+                    self._by_file_hash[file_hash] = doc_id
+                self.next_doc_id += 1
+                self._rebuild_locator()
+            self._maybe_compress()
+            self._mark_dirty()
+        return doc_id
+
+    def _maybe_compress(self) -> bool:
+        """Re-encode a flat index into the configured type once it can be trained.
+
+        Called with ``_lock`` held, so no vectors arrive meanwhile; searches
+        keep using the flat index until the re-encoded one is swapped in.
+        """
+        if self.index is None or self.index_type == "flat" or index_kind(self.index) != "flat":
+            return False
+        if needs_training(self.index_type) and self.index.ntotal < TRAIN_SIZE:
+            return False
+        with self._rw.read():
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        index = make_index(vectors, self.index_type)
+        index.add(vectors)
+        with self._rw.write():
+            self.index = index
+        logger.info(f"Compressed RAG index to {self.index_type} ({index.ntotal} vectors)")
+        return True
+
+    # Reads
+    def has_document(self, doc_id: int) -> bool:
+        return doc_id in self.docs
+
+    def find_document(self, file_hash: str) -> Optional[int]:
+        """doc_id of an earlier upload with identical file contents"""
+        return self._by_file_hash.get(file_hash)
+
+    def _find_chunks(self, hashes: np.ndarray) -> np.ndarray:
+        """Vector ID of an already indexed chunk with each hash, or -1"""
+        if len(self._hashes) == 0:
+            return np.full(len(hashes), -1, dtype="int64")
+        if self._sorted_hashes is None:
+            order = np.argsort(self._hashes, kind="stable")
+            self._hash_order, self._sorted_hashes = order, self._hashes[order]
+        order, sorted_hashes = self._hash_order, self._sorted_hashes
+        pos = np.minimum(np.searchsorted(sorted_hashes, hashes), len(order) - 1)
+        return np.where(sorted_hashes[pos] == hashes, order[pos], -1).astype("int64")
+
+    def reuse_chunks(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vector IDs (or -1) of indexed chunks with these hashes, and their stored vectors.
+
+        Only offered while the index stores vectors exactly (flat) or nearly so
+        (sq16): re-adding an sq8 or ivfpq reconstruction would compound the
+        quantization error, so those chunks are embedded afresh.
+        """
+        with self._rw.read():
+            if self.index is None or index_kind(self.index) not in ("flat", "sq16"):
+                return np.full(len(hashes), -1, dtype="int64"), np.zeros((0, 0), dtype="float32")
+            vector_ids = self._find_chunks(hashes)
+            found = vector_ids[vector_ids >= 0]
+            vectors = self.index.reconstruct_batch(found) if len(found) else np.zeros((0, self.index.d), dtype="float32")
+        return vector_ids, vectors
+
+    def locate(self, vector_id: int) -> Tuple[int, int]:
+        """Map a vector ID to (doc_id, chunk_no)"""
+        pos = bisect.bisect_right(self._starts, vector_id) - 1
+        if pos < 0:
+            raise KeyError(vector_id)
+        doc_id = self._start_doc_ids[pos]
+        chunk_no = vector_id - self.docs[doc_id]["start"]
+        if chunk_no >= self.docs[doc_id]["count"]:
+            raise KeyError(vector_id)
+        return doc_id, chunk_no
+
+    def get_chunks(self, doc_id: int) -> DocumentChunks:
+        """Chunk texts and pages for a document, loaded on first use"""
+        return self.chunks.get(doc_id)
+
+    def get_texts(self, doc_id: int, chunk_nos: List[int]) -> List[str]:
+        return self.chunks.texts(doc_id, chunk_nos)
+
+    def search(self, doc_id: int, query_embedding, k: int = 3) -> List[Tuple[int, float]]:
+        """Top-k (chunk_no, score) pairs restricted to one document"""
+        return self.search_many(doc_id, np.asarray(query_embedding).reshape(1, -1), k)[0]
+
+    def search_many(self, doc_id: int, query_embeddings: np.ndarray, k: int = 3) -> List[List[Tuple[int, float]]]:
+        """Top-k (chunk_no, score) pairs per query row, as one matrix search over one document"""
+        queries = np.ascontiguousarray(query_embeddings, dtype="float32")
+        with self._rw.read():
+            info, index = self.docs[doc_id], self.index
+            selector = faiss.IDSelectorRange(info["start"], info["start"] + info["count"], True)
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None:
+                # A document's chunks can sit in any list, so probe them all; only its IDs are scored
+                params = faiss.SearchParametersPreTransform(
+                    index_params=faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nlist)
+                )
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            D, I = index.search(queries, min(k, info["count"]), params=params)
+        return [
+            [(int(idx) - info["start"], float(score)) for idx, score in zip(ids, scores) if idx >= 0]
+            for ids, scores in zip(I, D)
+        ]
+
+    def stats(self) -> dict:
+        with self._rw.read():
+            index = self.index
+            vectors = index.ntotal if index is not None else 0
+            documents = len(self.docs)
+        # Stored code size; IVF lists also keep an 8-byte ID per vector
+        ivf = faiss.try_extract_index_ivf(index) if index is not None else None
+        bytes_per_vector = ivf.code_size + 8 if ivf is not None else (index.code_size if index is not None else 0)
+        return {
+            "index_type": index_kind(index) if index is not None else None,
+            "configured_index_type": self.index_type,
+            "documents": documents,
+            "vectors": vectors,
+            "bytes_per_vector": bytes_per_vector,
+            "vector_bytes": bytes_per_vector * vectors,
+            "chunks": self.chunks.stats()
+        }
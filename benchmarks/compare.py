@@ -0,0 +1,71 @@
+"""Compare two saved load-test runs and flag regressions.
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json \\
+        --max-latency-increase 10 --max-rps-drop 10
+
+A scenario regresses when its p95 or p99 latency grows by more than
+``--max-latency-increase`` percent, its throughput falls by more than
+``--max-rps-drop`` percent, or its error count rises. The exit status is 1
+if any scenario regressed, so the script can gate CI.
+"""
+import sys
+import json
+import argparse
+
+
+def pct_change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(base: dict, new: dict, max_latency_increase: float, max_rps_drop: float):
+    rows, regressions = [], []
+    for name in base["results"]:
+        if name not in new["results"]:
+            continue
+        old, cur = base["results"][name], new["results"][name]
+        changes = {
+            "rps": pct_change(old["rps"], cur["rps"]),
+            "p50_ms": pct_change(old["p50_ms"], cur["p50_ms"]),
+            "p95_ms": pct_change(old["p95_ms"], cur["p95_ms"]),
+            "p99_ms": pct_change(old["p99_ms"], cur["p99_ms"]),
+        }
+        reasons = [
+            f"{metric} +{changes[metric]:.1f}%" for metric in ("p95_ms", "p99_ms")
+            if changes[metric] > max_latency_increase
+        ]
+        if -changes["rps"] > max_rps_drop:
+            reasons.append(f"rps {changes['rps']:.1f}%")
+        if cur["errors"] > old["errors"]:
+            reasons.append(f"errors {old['errors']} -> {cur['errors']}")
+        rows.append((name, old, cur, changes, reasons))
+        if reasons:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--max-latency-increase", type=float, default=10.0, help="percent, p95 and p99")
+    parser.add_argument("--max-rps-drop", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    label = lambda run, path: run["meta"].get("label") or run["meta"].get("git") or path
+    print(f"base: {label(base, args.base)}   new: {label(new, args.new)}")
+    rows, regressions = compare(base, new, args.max_latency_increase, args.max_rps_drop)
+    print(f"{'scenario':<16} {'rps':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}  verdict")
+    for name, old, cur, changes, reasons in rows:
+        cells = [f"{old[m]:.1f}->{cur[m]:.1f} ({changes[m]:+.0f}%)" for m in ("rps", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{name:<16} {cells[0]:>16} {cells[1]:>18} {cells[2]:>18} {cells[3]:>18}  "
+              f"{'REGRESSION: ' + ', '.join(reasons) if reasons else 'ok'}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Parity and speed of the fast-path datetime extractor against dateparser.
+
+    python -m benchmarks.datetime_parity
+    python -m benchmarks.datetime_parity --show-declined
+
+Every command in the corpus goes through preprocess_text, as in
+/schedule/parse. Wherever the fast path answers, its result must equal
+dateparser's exactly. The script exits non-zero on any mismatch. It also
+reports how much of the corpus the fast path covers and the time per
+command on each path.
+"""
+import sys
+import time
+import argparse
+import itertools
+from datetime import date
+
+from app.utils.datetime_extract import fast_extract_datetime, preprocess_text, search_datetime
+
+TIMES = ["3pm", "3 pm", "12pm", "10pm", "4:15pm", "4:15 PM", "10:15 am", "9:00 AM", "12:00 PM",
+         "15:00", "7:05", "00:00", "23:59", "10am", "9am", "12:30am", "9", "13:00pm"]
+WHENS = ["tomorrow at {t}", "tomorrow {t}", "at {t}", "at {t} tomorrow", "on 2026-11-03 at {t}",
+         "2026-11-03 {t}", "at {t} on 2026-11-03", "2026-11-03T14:30", "on 2026-11-03",
+         "{d} at {t}", "on {d} at {t}", "next {d} at {t}", "this {d} {t}", "next {d}", "at {t} on {d}",
+         "{d} {t}", "tomorrow", "noon on {d}", "{d} morning", "tomorrow evening", "at midnight"]
+DAYS = ["Monday", "Tuesday", "wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+FRAMES = ["Meet with John {w}", "Schedule a call with Priya Patel {w}", "{w} sync with Bob",
+          "Book Sarah for {w} to review the roadmap", "Lunch with May {w}", "Call Olivia {w} EST",
+          "Meet Chen {w} for two hours", "Book 2 rooms {w}", "Catch up with Ahmed {w}, last one this month"]
+EXTRA = ["lunch", "Meet with John", "2026-02-30 at 3pm", "at 3pm, Friday", "at 3 p.m.",
+         "Meet Mike at 10am", "2026-11-03 and 2026-11-04", "Friday or Monday at 3pm", "in 2 days at 3pm",
+         "at 3pm at 2026-10-18", "Standup at 9:30 with Tom"]
+
+
+def corpus():
+    whens = {w.format(t=t, d=d) for w, t, d in itertools.product(WHENS, TIMES, DAYS)}
+    return sorted({frame.format(w=w) for frame in FRAMES for w in whens} | set(EXTRA))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--show-declined", action="store_true", help="list commands left to dateparser")
+    args = parser.parse_args()
+
+    commands = [preprocess_text(c) for c in corpus()]
+    today = date.today()
+    answered = mismatched = 0
+    fast_time = slow_time = 0.0
+    for command in commands:
+        start = time.perf_counter()
+        fast = fast_extract_datetime(command, today)
+        fast_time += time.perf_counter() - start
+        start = time.perf_counter()
+        slow = search_datetime(command)
+        slow_time += time.perf_counter() - start
+
+        if fast is None:
+            if args.show_declined:
+                print(f"declined  {command!r} -> {slow.isoformat() if slow else None}")
+            continue
+        answered += 1
+        if slow is None or fast.isoformat() != slow.isoformat():
+            mismatched += 1
+            print(f"MISMATCH  {command!r}: fast={fast.isoformat()} dateparser={slow.isoformat() if slow else None}")
+
+    n = len(commands)
+    print(f"commands={n} answered_by_fast_path={answered} ({answered / n:.1%}) mismatches={mismatched}")
+    print(f"fast path {fast_time / n * 1e6:.1f} us/command, dateparser {slow_time / n * 1e6:.1f} us/command")
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Local OpenAI-compatible stand-in for OpenRouter, for load tests.
+
+    python -m benchmarks.fake_llm --port 9100 --ttft 0.3 --tokens-per-sec 80
+    LLM_BASE_URL=http://127.0.0.1:9100/v1 OPENROUTER_API_KEY=fake uvicorn app.main:app
+
+Serves ``POST /v1/chat/completions``, streaming (SSE) and non-streaming;
+streams end with a usage chunk when ``stream_options.include_usage`` is set.
+Each reply waits ``--ttft`` seconds (plus up to ``--jitter``), then emits
+``--reply-tokens`` tokens at ``--tokens-per-sec``. ``--error-rate`` returns
+that fraction of requests as 429 with Retry-After, to exercise retries.
+``GET /stats`` reports how many requests were served.
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("the quarterly plan covers pricing hiring and a pilot with two design partners "
+         "while the team validates demand and keeps burn under control").split()
+
+config = {"ttft": 0.3, "jitter": 0.1, "tokens_per_sec": 80.0, "reply_tokens": 120, "error_rate": 0.0}
+stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "tokens": 0}
+
+app = FastAPI(title="Fake LLM")
+
+
+def reply_tokens(n: int):
+    return [("" if i == 0 else " ") + WORDS[i % len(WORDS)] for i in range(n)]
+
+
+def prompt_tokens(messages) -> int:
+    return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    if random.random() < config["error_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(status_code=429, headers={"Retry-After": "0.2"},
+                            content={"error": {"message": "rate limited (fake)", "type": "rate_limit"}})
+
+    tokens = reply_tokens(min(int(body.get("max_tokens") or config["reply_tokens"]), config["reply_tokens"]))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "fake")
+    usage = {
+        "prompt_tokens": prompt_tokens(body.get("messages", [])),
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens(body.get("messages", [])) + len(tokens)
+    }
+    stats["tokens"] += len(tokens)
+    await asyncio.sleep(config["ttft"] + random.uniform(0, config["jitter"]))
+    delay = 1.0 / config["tokens_per_sec"] if config["tokens_per_sec"] > 0 else 0.0
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events():
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(delay)
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": token} if i == 0
+                                 else {"content": token}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            if include_usage:
+                # As OpenAI does: one last chunk with no choices, carrying the whole request's usage
+                usage_chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [], "usage": usage
+                }
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(delay * max(len(tokens) - 1, 0))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens)},
+            "finish_reason": "stop"
+        }],
+        "usage": usage
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "config": config}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=config["ttft"], help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=config["jitter"], help="extra random first-token delay")
+    parser.add_argument("--tokens-per-sec", type=float, default=config["tokens_per_sec"], help="0 = instant")
+    parser.add_argument("--reply-tokens", type=int, default=config["reply_tokens"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="fraction answered 429")
+    args = parser.parse_args()
+    config.update(ttft=args.ttft, jitter=args.jitter, tokens_per_sec=args.tokens_per_sec,
+                  reply_tokens=args.reply_tokens, error_rate=args.error_rate)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Deterministic fixture PDFs and profile CSVs for load tests.
+
+    python -m benchmarks.fixtures --out benchmarks/fixtures
+
+Writes ``doc_{small,medium,large}.pdf`` (5/50/300 pages of text) and
+``profiles_{small,medium,large}.csv`` (200/5k/50k rows with the columns of
+data/startup_profiles.csv). PDFs are written directly in PDF 1.4 syntax with
+the built-in Helvetica font, so no PDF library is needed.
+"""
+import os
+import csv
+import random
+import argparse
+from typing import List
+
+PDF_SIZES = {"small": 5, "medium": 50, "large": 300}  # pages
+CSV_SIZES = {"small": 200, "medium": 5_000, "large": 50_000}  # rows
+LINES_PER_PAGE = 45
+PROFILE_COLUMNS_SOURCE = "data/startup_profiles.csv"
+
+VOCABULARY = ("revenue market customer pricing churn onboarding pipeline retention compliance platform "
+              "analytics growth partnership logistics inventory forecast hiring roadmap security latency "
+              "subscription enterprise pilot contract margin supplier warehouse clinic students farmers").split()
+FIRST_NAMES = ["Asha", "Ben", "Carla", "Dev", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jon", "Kemi", "Liam"]
+LAST_NAMES = ["Rao", "Okafor", "Silva", "Chen", "Novak", "Haddad", "Kim", "Moreau", "Patel", "Berg"]
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def page_lines(rng: random.Random, page: int) -> List[str]:
+    lines = [f"Section {page + 1}: {rng.choice(VOCABULARY).title()} review"]
+    lines += [sentence(rng) for _ in range(LINES_PER_PAGE - 1)]
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, seed: int = 0):
+    rng = random.Random(seed)
+    objects = {1: "<< /Type /Catalog /Pages 2 0 R >>", 3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        body = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in page_lines(rng, page)
+        ) + " ET"
+        objects[content_id] = f"<< /Length {len(body)} >>\nstream\n{body}\nendstream"
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{page_id} 0 R")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n{objects[obj_id]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for obj_id in sorted(objects):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def profile_columns() -> List[str]:
+    with open(PROFILE_COLUMNS_SOURCE, newline="") as f:
+        return [col.strip() for col in next(csv.reader(f))]
+
+
+def profile_row(rng: random.Random, columns: List[str], i: int) -> List[str]:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    row = []
+    for col in columns:
+        if rng.random() < 0.15:
+            row.append("")  # unanswered
+        elif col == "Full Name":
+            row.append(f"{first} {last}")
+        elif col == "Email Address":
+            row.append(f"{first.lower()}.{last.lower()}{i}@example.com")
+        elif col == "Phone Number":
+            row.append(f"+1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}")
+        elif col == "Startup Name":
+            row.append(f"{rng.choice(VOCABULARY).title()}{rng.choice(['ly', 'io', 'Labs', 'AI'])}")
+        else:
+            row.append(" ".join(sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(1, 3))))
+    return row
+
+
+def write_profiles_csv(path: str, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    columns = profile_columns()
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(rows):
+            writer.writerow(profile_row(rng, columns, i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="benchmarks/fixtures")
+    parser.add_argument("--sizes", default="small,medium,large")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for size in args.sizes.split(","):
+        pdf_path = os.path.join(args.out, f"doc_{size}.pdf")
+        write_pdf(pdf_path, PDF_SIZES[size])
+        csv_path = os.path.join(args.out, f"profiles_{size}.csv")
+        write_profiles_csv(csv_path, CSV_SIZES[size])
+        print(f"{pdf_path} ({PDF_SIZES[size]} pages), {csv_path} ({CSV_SIZES[size]} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Drive the API endpoints at fixed concurrency and report latency percentiles.
+
+    python -m benchmarks.fake_llm --port 9100 &
+    LLM_BASE_URL=http://127.0.0.1:9100/v1 OPENROUTER_API_KEY=fake uvicorn app.main:app --port 8000 &
+    python -m benchmarks.loadtest --scenarios schedule_parse,email_draft,chat_message \\
+        --concurrency 16 --requests 300 --out benchmarks/results/base.json
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json
+
+Each scenario runs ``--requests`` calls from ``--concurrency`` workers.
+Session setup, such as starting a chat or profile session or ingesting
+the document for rag_query, happens outside the timed call. Non-2xx
+responses count as errors and are left out of the percentiles. Results
+can be saved as JSON for ``benchmarks.compare``.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fixtures import PDF_SIZES, write_pdf
+from benchmarks.scheduler_batch_bench import make_commands
+
+QUERIES = ["What are the main risks in section {n}?", "Summarize the pricing discussion",
+           "Which customers are mentioned in section {n}?", "What is the hiring plan?",
+           "How does the roadmap address retention?", "What does section {n} say about margin?"]
+CHAT_MESSAGES = ["How should I price a B2B analytics product?", "Give me three ideas to reduce churn",
+                 "What should a seed pitch deck contain?", "How do I find design partners?"]
+
+
+class Scenario(ABC):
+    """One endpoint under load; ``prepare`` runs untimed before each ``call``"""
+
+    name = ""
+
+    def __init__(self, args):
+        self.args = args
+
+    async def setup(self, client: httpx.AsyncClient):
+        pass
+
+    async def prepare(self, client: httpx.AsyncClient, state: dict):
+        pass
+
+    @abstractmethod
+    async def call(self, client: httpx.AsyncClient, state: dict, i: int) -> httpx.Response:
+        ...
+
+
+def fixture_pdf(args) -> str:
+    path = args.pdf or os.path.join("benchmarks", "fixtures", f"doc_{args.pdf_size}.pdf")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_pdf(path, PDF_SIZES[args.pdf_size])
+    return path
+
+
+async def upload(client: httpx.AsyncClient, path: str, unique: bool = False) -> httpx.Response:
+    """POST a PDF; ``unique`` appends a PDF comment so the upload is not deduplicated"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if unique:
+        data += f"%{uuid.uuid4().hex}\n".encode()
+    return await client.post("/rag/upload", files={"file": (os.path.basename(path), data, "application/pdf")})
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, timeout: float = 600) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/rag/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"Ingest job {job_id} did not finish in {timeout}s")
+
+
+class RagUpload(Scenario):
+    """Time to accept an upload (202 + job ID)"""
+    name = "rag_upload"
+
+    async def call(self, client, state, i):
+        return await upload(client, fixture_pdf(self.args), unique=True)
+
+
+class RagIngest(Scenario):
+    """Upload through to the ingestion job finishing"""
+    name = "rag_ingest"
+
+    async def call(self, client, state, i):
+        response = await upload(client, fixture_pdf(self.args), unique=True)
+        if response.status_code != 202:
+            return response
+        job = await wait_for_job(client, response.json()["job_id"])
+        return httpx.Response(200 if job["status"] == "completed" else 500, json=job)
+
+
+class RagQuery(Scenario):
+    name = "rag_query"
+
+    async def setup(self, client):
+        response = await upload(client, fixture_pdf(self.args))
+        response.raise_for_status()
+        if "doc_id" in response.json():  # already ingested by an earlier run
+            self.doc_id = response.json()["doc_id"]
+            return
+        job = await wait_for_job(client, response.json()["job_id"])
+        if job["status"] != "completed":
+            raise RuntimeError(f"Fixture ingestion failed: {job.get('error')}")
+        self.doc_id = job["result"]["doc_id"]
+
+    async def call(self, client, state, i):
+        query = QUERIES[i % len(QUERIES)].format(n=i % PDF_SIZES[self.args.pdf_size] + 1)
+        return await client.post("/rag/query", params={"doc_id": self.doc_id, "query": query})
+
+
+class ProfileSubmit(Scenario):
+    """Answer the suggested question of a live profile session, restarting when complete"""
+    name = "profile_submit"
+
+    async def prepare(self, client, state):
+        if not state.get("question"):
+            started = (await client.post("/profile/start")).json()
+            state.update(session_id=started["session_id"], question=started["question"])
+
+    async def call(self, client, state, i):
+        question = state["question"]
+        answer = (f"user{i}@example.com" if "email" in question.lower() else
+                  "+1 555 123 4567" if "phone" in question.lower() else
+                  f"We help {QUERIES[i % len(QUERIES)].split()[-1].rstrip('?')} teams cut costs with automation")
+        response = await client.post("/profile/submit", params={
+            "session_id": state["session_id"], "question": question, "answer": answer
+        })
+        body = response.json() if response.status_code == 200 else {}
+        state["question"] = body.get("next_question") if body.get("status") == "continue" else None
+        return response
+
+
+class ScheduleParse(Scenario):
+    name = "schedule_parse"
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.commands = make_commands(1000)
+
+    async def call(self, client, state, i):
+        return await client.post("/schedule/parse", json={"command": self.commands[i % len(self.commands)]})
+
+
+class EmailDraft(Scenario):
+    name = "email_draft"
+
+    async def call(self, client, state, i):
+        return await client.post("/email/draft", json={
+            "recipient": f"investor{i % 50}@example.com",
+            "subject": f"Follow-up on our call #{i}",
+            "tone": ["professional", "friendly", "concise"][i % 3],
+            "details": "Thank them for their time, share the pilot results and propose a meeting next week"
+        })
+
+
+class ChatMessage(Scenario):
+    name = "chat_message"
+
+    async def prepare(self, client, state):
+        if "session_id" not in state:
+            state["session_id"] = (await client.post("/chat/start")).json()["session_id"]
+
+    async def call(self, client, state, i):
+        return await client.post("/chat/message", params={
+            "session_id": state["session_id"], "message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)]
+        })
+
+
+SCENARIOS = {cls.name: cls for cls in (RagUpload, RagIngest, RagQuery, ProfileSubmit,
+                                       ScheduleParse, EmailDraft, ChatMessage)}
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, statuses: Dict[str, int]) -> dict:
+    ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + errors,
+        "ok": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2)
+    }
+
+
+async def run_scenario(scenario: Scenario, client: httpx.AsyncClient, requests: int, concurrency: int) -> dict:
+    await scenario.setup(client)
+    counter = iter(range(requests))
+    latencies, statuses = [], {}
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        state = {}
+        for i in counter:
+            try:
+                await scenario.prepare(client, state)
+                start = time.perf_counter()
+                response = await scenario.call(client, state, i)
+                elapsed = time.perf_counter() - start
+                status = str(response.status_code)
+            except Exception as e:
+                elapsed, status = None, type(e).__name__
+                state.clear()
+            statuses[status] = statuses.get(status, 0) + 1
+            if elapsed is not None and status.startswith("2"):
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start, statuses)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def print_table(results: Dict[str, dict]):
+    print(f"{'scenario':<16} {'ok':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<16} {r['ok']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for name in args.scenarios.split(","):
+            scenario = SCENARIOS[name](args)
+            print(f"running {name}: {args.requests} requests at concurrency {args.concurrency}")
+            results[name] = await run_scenario(scenario, client, args.requests, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default="schedule_parse,email_draft,chat_message,profile_submit,rag_query",
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--pdf", help="PDF for the rag scenarios (default: generated fixture)")
+    parser.add_argument("--pdf-size", default="small", choices=list(PDF_SIZES))
+    parser.add_argument("--label", help="name for this run in saved results")
+    parser.add_argument("--out", help="write results as JSON for benchmarks.compare")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios.split(",") if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({
+                "meta": {
+                    "label": args.label,
+                    "git": git_revision(),
+                    "timestamp": datetime.now().isoformat(),
+                    "base_url": args.base_url,
+                    "concurrency": args.concurrency,
+                    "requests": args.requests
+                },
+                "results": results
+            }, f, indent=2)
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
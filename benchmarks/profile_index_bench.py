@@ -0,0 +1,85 @@
+"""Recall and latency of approximate profile indexes against exact flat search.
+
+    python -m benchmarks.profile_index_bench --n 200000 --dim 384 --k 25
+    python -m benchmarks.profile_index_bench --csv data/startup_profiles.csv
+
+Synthetic vectors are drawn around random cluster centres and L2-normalized,
+matching how profile embeddings are indexed. With ``--csv`` the real profile
+records are encoded with EMBEDDING_MODEL instead.
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+
+from app.models.profile_index import make_index
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype("float32")
+    vectors = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def csv_vectors(csv_path: str) -> np.ndarray:
+    import pandas as pd
+    from app.models.embeddings import get_embedding_model
+    from app.models.profile_index import build_records, record_text
+
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.map(str).str.strip()
+    texts = [record_text(rec["fields"]) for rec in build_records(df)]
+    return np.asarray(get_embedding_model().encode(texts, normalize_embeddings=True), dtype="float32")
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, k: int, index_types):
+    exact = make_index(vectors, "flat")
+    _, truth = exact.search(queries, k)
+
+    print(f"{'index':<6} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(k):>10}")
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = make_index(vectors, index_type)
+        build_time = time.perf_counter() - start
+
+        latencies, found = [], []
+        for q in queries:
+            start = time.perf_counter()
+            _, ids = index.search(q.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(ids[0])
+
+        recall = np.mean([
+            len(set(ids[ids >= 0]) & set(true_ids)) / k
+            for ids, true_ids in zip(found, truth)
+        ])
+        print(f"{index_type:<6} {build_time:>8.2f} {np.percentile(latencies, 50):>8.3f} "
+              f"{np.percentile(latencies, 95):>8.3f} {recall:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector dimension (MiniLM is 384)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=25, help="neighbours per query (TOPK_PROFILES)")
+    parser.add_argument("--csv", help="encode this profiles CSV instead of synthetic vectors")
+    parser.add_argument("--types", default="flat,hnsw,ivf")
+    args = parser.parse_args()
+
+    vectors = csv_vectors(args.csv) if args.csv else synthetic_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)] + 0.05 * rng.standard_normal(
+        (args.queries, vectors.shape[1])).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"corpus={len(vectors)} dim={vectors.shape[1]} queries={len(queries)} "
+          f"threads={os.getenv('OMP_NUM_THREADS', 'default')}")
+    run(vectors, queries.astype("float32"), args.k, args.types.split(","))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Memory, recall and latency of the compressed RAG index types against flat.
+
+    python -m benchmarks.rag_index_bench --docs 200 --chunks 100 --dim 768
+    python -m benchmarks.rag_index_bench --pdf benchmarks/fixtures/doc_large.pdf --docs 50
+
+Each index type gets its own DocumentVectorStore in a temporary directory
+and answers the same per-document top-k queries; recall is measured
+against the flat store. Synthetic chunk vectors are drawn around
+per-document topic centres in a 64-dimensional latent space, projected to
+``--dim`` with a little isotropic noise, and L2-normalized. With ``--pdf`` the chunks of
+that PDF are embedded with RAG_EMBEDDING_MODEL and reused as every
+document's chunks, each copy jittered slightly. The chunk-text section
+compares the compact chunk store with the list of dicts it replaced.
+"""
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from app.utils.chunk_store import DocumentChunks
+from app.utils.vector_store import INDEX_TYPES, TRAIN_SIZE, DocumentVectorStore
+from benchmarks.fixtures import sentence
+
+
+def synthetic_docs(docs: int, chunks: int, dim: int, latent: int = 64, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Sentence embeddings occupy a low-dimensional subspace; isotropic noise would not compress at all
+    basis = rng.standard_normal((latent, dim)).astype("float32")
+    for _ in range(docs):
+        topics = rng.standard_normal((4, latent)).astype("float32")
+        codes = topics[rng.integers(0, 4, chunks)] + 0.8 * rng.standard_normal((chunks, latent)).astype("float32")
+        vectors = codes @ basis + 0.1 * np.sqrt(latent) * rng.standard_normal((chunks, dim)).astype("float32")
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def pdf_docs(path: str, docs: int, seed: int = 0):
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from app.agents.rag_agent import EMBEDDING_MODEL
+    from app.models.embeddings import get_embedding_model
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    texts = [chunk.page_content for chunk in splitter.split_documents(PyPDFLoader(path).load())]
+    base = np.asarray(get_embedding_model(EMBEDDING_MODEL).encode(texts, normalize_embeddings=True), dtype="float32")
+    rng = np.random.default_rng(seed)
+    for _ in range(docs):
+        vectors = base + 0.02 * rng.standard_normal(base.shape).astype("float32")
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def chunk_dicts(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [{"text": " ".join(sentence(rng) for _ in range(12)), "metadata": {"page": i // 4}} for i in range(n)]
+
+
+def allocated(build) -> int:
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def run(documents, index_types, queries: int, k: int):
+    stores = {}
+    for index_type in index_types:
+        store = DocumentVectorStore(tempfile.mkdtemp(prefix=f"rag_{index_type}_"), index_type=index_type)
+        start = time.perf_counter()
+        for vectors in documents:
+            store.add_document(vectors, [{"text": "", "metadata": {}}] * len(vectors))
+        stores[index_type] = (store, time.perf_counter() - start)
+
+    rng = np.random.default_rng(1)
+    doc_ids = rng.integers(0, len(documents), queries)
+    probes = []
+    for doc_id in doc_ids:
+        q = documents[doc_id][rng.integers(0, len(documents[doc_id]))]
+        q = q + 0.3 * rng.standard_normal(q.shape).astype("float32")
+        probes.append((int(doc_id), q / np.linalg.norm(q)))
+
+    flat = stores.get("flat", (DocumentVectorStore(tempfile.mkdtemp()), 0))[0]
+    if flat.index is None:
+        for vectors in documents:
+            flat.add_document(vectors, [{"text": "", "metadata": {}}] * len(vectors))
+    truth = [{chunk_no for chunk_no, _ in flat.search(doc_id, q, k)} for doc_id, q in probes]
+
+    print(f"{'index':<6} {'stored':<6} {'B/vector':>9} {'vectors MB':>11} {'build s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(k):>10}")
+    for index_type, (store, build_time) in stores.items():
+        latencies, recalls = [], []
+        for (doc_id, q), true_ids in zip(probes, truth):
+            start = time.perf_counter()
+            hits = store.search(doc_id, q, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len({chunk_no for chunk_no, _ in hits} & true_ids) / len(true_ids))
+        stats = store.stats()
+        print(f"{index_type:<6} {stats['index_type']:<6} {stats['bytes_per_vector']:>9} "
+              f"{stats['vector_bytes'] / 1e6:>11.1f} {build_time:>8.2f} {np.percentile(latencies, 50):>8.3f} "
+              f"{np.percentile(latencies, 95):>8.3f} {np.mean(recalls):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=100, help="chunks per synthetic document")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic dimension (all-mpnet-base-v2 is 768)")
+    parser.add_argument("--pdf", help="embed this PDF's chunks instead of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3, help="chunks per query, as /rag/query uses")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    args = parser.parse_args()
+
+    documents = list(pdf_docs(args.pdf, args.docs) if args.pdf else synthetic_docs(args.docs, args.chunks, args.dim))
+    total = sum(len(vectors) for vectors in documents)
+    print(f"documents={len(documents)} vectors={total} dim={documents[0].shape[1]} train_size={TRAIN_SIZE}")
+    if total < TRAIN_SIZE:
+        print(f"note: sq8 and ivfpq stay flat below RAG_INDEX_TRAIN_SIZE={TRAIN_SIZE} vectors")
+    run(documents, args.types.split(","), args.queries, args.k)
+
+    chunks = chunk_dicts(args.chunks)
+    as_dicts = allocated(lambda: chunk_dicts(args.chunks))
+    compact = allocated(lambda: DocumentChunks.from_chunks(chunks))
+    print(f"chunk text, {args.chunks} chunks: list of dicts {as_dicts / 1e3:.0f} KB, "
+          f"compact store {compact / 1e3:.0f} KB ({as_dicts / compact:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Throughput of /schedule/parse-batch against parsing one command at a time.
+
+    python -m benchmarks.scheduler_batch_bench --n 2000 --workers 4
+
+Both paths run in-process without HTTP. The single path calls
+``parse_command`` per command (full spaCy pipeline plus dateparser on one
+core); the batch path is what the endpoint runs: ``nlp.pipe`` with unused
+components disabled, overlapped with datetime extraction in the process pool.
+Throughput per core divides by the cores each path keeps busy.
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+
+TEMPLATES = [
+    "Meet with {name} tomorrow at {hour}pm",
+    "Schedule a call with {name} next {day} at {hour}:30",
+    "Book {name} for {day} morning",
+    "Can we set up a meeting with {name} on 2026-11-{date:02d} at {hour}:00",
+    "Lunch with {name} at noon on {day}",
+    "call {name} in the evening",
+]
+NAMES = ["John", "Sarah", "Priya Patel", "Chen Wei", "Maria", "Ahmed", "Olivia Brown"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def make_commands(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            name=rng.choice(NAMES), day=rng.choice(DAYS), hour=rng.randint(1, 11), date=rng.randint(1, 28)
+        )
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1000, help="commands per run")
+    parser.add_argument("--workers", type=int, help="datetime worker processes (SCHEDULE_PARSE_WORKERS)")
+    parser.add_argument("--skip-single", action="store_true", help="only time the batch path")
+    args = parser.parse_args()
+    if args.workers is not None:
+        os.environ["SCHEDULE_PARSE_WORKERS"] = str(args.workers)
+
+    from app.agents import scheduler_agent as agent
+    from app.utils.datetime_extract import preprocess_text
+
+    commands = [preprocess_text(c) for c in make_commands(args.n)]
+    workers = agent.SCHEDULE_PARSE_WORKERS
+    print(f"commands={len(commands)} workers={workers} cpus={os.cpu_count()} "
+          f"disabled={[c for c in agent.BATCH_DISABLED_COMPONENTS if c in agent.get_nlp().pipe_names]}")
+
+    async def batch():
+        return await asyncio.gather(
+            asyncio.to_thread(agent.extract_persons, commands),
+            agent.extract_datetimes(commands)
+        )
+
+    # Start the worker processes outside the timed run
+    asyncio.run(agent.extract_datetimes(commands[:workers * agent.SCHEDULE_PARSE_CHUNK]))
+
+    print(f"{'path':<8} {'seconds':>8} {'cmd/s':>9} {'cores':>6} {'cmd/s/core':>11}")
+    if not args.skip_single:
+        start = time.perf_counter()
+        single = [agent.parse_command(c) for c in commands]
+        elapsed = time.perf_counter() - start
+        print(f"{'single':<8} {elapsed:>8.2f} {len(commands) / elapsed:>9.1f} {1:>6} {len(commands) / elapsed:>11.1f}")
+
+    start = time.perf_counter()
+    persons, datetimes = asyncio.run(batch())
+    elapsed = time.perf_counter() - start
+    cores = min(workers + 1, os.cpu_count() or 1)
+    print(f"{'batch':<8} {elapsed:>8.2f} {len(commands) / elapsed:>9.1f} {cores:>6} "
+          f"{len(commands) / elapsed / cores:>11.1f}")
+
+    if not args.skip_single:
+        same = sum(
+            p == bp and (dt.isoformat() if dt else None) == bdt
+            for (p, dt), bp, bdt in zip(single, persons, datetimes)
+        )
+        print(f"batch matches single-command results for {same}/{len(commands)} commands")
+
+    if agent.parse_pool is not None:
+        agent.parse_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()